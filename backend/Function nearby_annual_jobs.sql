@@ -0,0 +1,34 @@
+-- Used by route_template_builder.get_nearby_annuals: open, non-MOI jobs within
+-- radius_miles of a route center, excluding the route's own sites.
+-- The expression index below lets ST_DWithin use a GiST scan instead of
+-- reading every job_pool row.
+
+CREATE INDEX IF NOT EXISTS job_pool_location_geog_idx
+    ON public.job_pool
+    USING gist ((ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography));
+
+CREATE OR REPLACE FUNCTION public.nearby_annual_jobs(
+    center_lat double precision,
+    center_lon double precision,
+    radius_miles double precision DEFAULT 50,
+    due_cutoff date DEFAULT NULL,
+    exclude_site_ids bigint[] DEFAULT '{}'
+)
+RETURNS SETOF job_pool
+LANGUAGE sql
+STABLE
+AS $function$
+    SELECT j.*
+    FROM job_pool j
+    WHERE
+        j.jp_status IN ('Call', 'Waiting to Schedule')
+        AND (due_cutoff IS NULL OR j.due_date <= due_cutoff)
+        AND (j.site_id IS NULL OR NOT j.site_id = ANY(exclude_site_ids))
+        AND COALESCE(j.sow_1, '') NOT ILIKE '%MOI%'
+        AND ST_DWithin(
+            ST_SetSRID(ST_MakePoint(j.longitude, j.latitude), 4326)::geography,
+            ST_SetSRID(ST_MakePoint(center_lon, center_lat), 4326)::geography,
+            radius_miles * 1609.34,
+            false  -- sphere; the caller trusts this radius and doesn't re-filter
+        );
+$function$;
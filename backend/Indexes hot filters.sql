@@ -0,0 +1,26 @@
+-- Composite indexes for the filters the API and schedulers run on every request.
+-- CONCURRENTLY avoids locking the tables; run each statement on its own
+-- (not inside a transaction block).
+-- job_technician_eligibility needs no unique (work_order, technician_id) index:
+-- its primary key already is one, and it serves work_order lookups too.
+-- scheduled_jobs.work_order is likewise already the primary key.
+-- Check with EXPLAIN (ANALYZE, BUFFERS) after creating.
+
+-- Tech week views: scheduled_jobs for one technician over a date range
+-- (scheduler_fillin.get_existing_schedule, schedule_week_geographic)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS scheduled_jobs_tech_date_idx
+    ON public.scheduled_jobs (technician_id, date);
+
+-- Open-job reads: jp_status IN ('Call', 'Waiting to Schedule') with a due_date window
+-- (get_unscheduled_jobs, monthly_analysis, db_queries.get_job_pool)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS job_pool_status_due_idx
+    ON public.job_pool (jp_status, due_date);
+
+-- Per-tech eligibility: recalculate_eligibility_for_tech deletes by technician_id,
+-- and tech-filtered eligibility lookups can't use the (work_order, technician_id) key
+CREATE INDEX CONCURRENTLY IF NOT EXISTS job_technician_eligibility_tech_idx
+    ON public.job_technician_eligibility (technician_id);
+
+-- Time off by technician and date (save/delete time off, daily availability checks)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS time_off_requests_tech_start_idx
+    ON public.time_off_requests (technician_id, start_date);
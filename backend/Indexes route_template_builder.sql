@@ -0,0 +1,16 @@
+-- Indexes for the date-window reads in route_template_builder.py.
+-- CONCURRENTLY avoids locking the tables; run each statement on its own
+-- (not inside a transaction block).
+-- INCLUDE lists match the select lists, so the reads can be index-only scans.
+-- Check with EXPLAIN (ANALYZE, BUFFERS) after creating.
+
+-- get_last_month_routes: scheduled_jobs in a 2-week window, grouped by technician
+CREATE INDEX CONCURRENTLY IF NOT EXISTS scheduled_jobs_date_tech_idx
+    ON public.scheduled_jobs (date, technician_id)
+    INCLUDE (work_order, site_id, site_name, sow_1, duration, latitude, longitude, site_city, site_state);
+
+-- find_historically_paired_sites: job_history by week window, matched on site_id
+-- (columns = HISTORY_COLUMNS)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS job_history_date_site_idx
+    ON public.job_history (scheduled_date, site_id)
+    INCLUDE (work_order, technician_id, site_name, sow_1, region);
@@ -1,17 +1,35 @@
 import math
-import random
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, Optional
 from dataclasses import dataclass
-import copy
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+def _route_miles_py(order, dist_start, dist_matrix):
+    """Sum of legs for a route given as job indices (start -> order[0] -> ...)."""
+    total = dist_start[order[0]]
+    for k in range(order.size - 1):
+        total += dist_matrix[order[k], order[k + 1]]
+    return total
+
+# Compiled when numba is installed; otherwise calculate_route_cost uses NumPy indexing
+_route_miles = None
+if njit is not None:
+    _route_miles = njit(cache=True, fastmath=True)(_route_miles_py)
+    _route_miles(np.zeros(1, dtype=np.int64), np.zeros(1), np.zeros((1, 1)))  # warm up JIT
 
 # Re-using your dataclass or defining a compatible interface
-@dataclass
+@dataclass(slots=True, frozen=True)
 class OptimizationJob:
     id: str
     lat: float
     lon: float
     duration: float
-    priority_score: float # Higher is more important
+    idx: int = -1 # Row/column in SmartRouter's distance matrix
 
 class SmartRouter:
     """
@@ -19,8 +37,17 @@ class SmartRouter:
     optimizer to reduce drive time and fit more jobs.
     """
 
-    def __init__(self, avg_speed_mph: float = 55.0):
+    EARTH_RADIUS_MILES = 3958.8
+
+    def __init__(self, avg_speed_mph: float = 55.0, seed: Optional[int] = 0):
         self.avg_speed = avg_speed_mph
+        self.seed = seed  # SA RNG seed; same seed + same jobs -> same route
+        # Filled by _build_distance_matrix() for the current build_route call
+        self.dist_matrix = None   # dist_matrix[a, b] = miles from job a to job b
+        self.dist_start = None    # dist_start[a] = miles from start location to job a
+        # Filled by build_route(): int8 priority per job index (10 = Urgent, 1 = other)
+        self.priority_scores = None
+        self.durations = None     # durations[a] = on-site hours for job a
 
     def haversine(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
         """Standard distance calculation."""
@@ -35,6 +62,30 @@ class SmartRouter:
         except (ValueError, TypeError):
             return 0.0
 
+    def _build_distance_matrix(self, opt_jobs: List[OptimizationJob], start_loc: Tuple[float, float]):
+        """
+        Precompute all pairwise job distances (and start -> job distances) once,
+        so route costs become array lookups instead of repeated trig.
+        Bad coordinates give 0.0, same as haversine().
+        """
+        lat_rad = np.radians(np.array([j.lat for j in opt_jobs], dtype=float))
+        lon_rad = np.radians(np.array([j.lon for j in opt_jobs], dtype=float))
+
+        dlat = lat_rad[:, None] - lat_rad[None, :]
+        dlon = lon_rad[:, None] - lon_rad[None, :]
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat_rad)[:, None] * np.cos(lat_rad)[None, :] * np.sin(dlon / 2) ** 2
+        self.dist_matrix = np.nan_to_num(2 * self.EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0))))
+
+        try:
+            start_lat, start_lon = np.radians(float(start_loc[0])), np.radians(float(start_loc[1]))
+        except (ValueError, TypeError):
+            self.dist_start = np.zeros(len(opt_jobs))
+            return
+        dlat = lat_rad - start_lat
+        dlon = lon_rad - start_lon
+        a = np.sin(dlat / 2) ** 2 + np.cos(start_lat) * np.cos(lat_rad) * np.sin(dlon / 2) ** 2
+        self.dist_start = np.nan_to_num(2 * self.EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0))))
+
     def calculate_route_cost(self, route: List[OptimizationJob], start_loc: Tuple[float, float]) -> Tuple[float, float]:
         """
         Calculates total time (drive + work) and drive distance.
@@ -43,6 +94,11 @@ class SmartRouter:
         if not route:
             return 0.0, 0.0
 
+        if self.dist_matrix is not None:
+            total_miles = self._order_miles([j.idx for j in route])
+            total_work = sum(j.duration for j in route)
+            return (total_miles / self.avg_speed) + total_work, total_miles
+
         current_lat, current_lon = start_loc
         total_miles = 0.0
         total_work = 0.0
@@ -57,6 +113,13 @@ class SmartRouter:
         total_hours = drive_hours + total_work
         return total_hours, total_miles
 
+    def _order_miles(self, order: List[int]) -> float:
+        """Drive miles for a non-empty route given as job indices."""
+        idx = np.asarray(order, dtype=np.int64)
+        if _route_miles is not None:
+            return float(_route_miles(idx, self.dist_start, self.dist_matrix))
+        return float(self.dist_start[idx[0]] + self.dist_matrix[idx[:-1], idx[1:]].sum())
+
     def build_route(self, 
                    available_jobs: List[Any], 
                    start_location: Tuple[float, float], 
@@ -67,98 +130,122 @@ class SmartRouter:
         """
         
         # 1. Convert your Job objects to OptimizationJob
-        opt_jobs = []
-        for j in available_jobs:
-            # Handle dict or object input
-            if isinstance(j, dict):
-                opt_jobs.append(OptimizationJob(
-                    id=j.get('work_order'), lat=j.get('latitude'), lon=j.get('longitude'),
-                    duration=j.get('duration', 2.0), priority_score=10 if j.get('jp_priority') == 'Urgent' else 1
-                ))
-            else:
-                opt_jobs.append(OptimizationJob(
-                    id=j.work_order, lat=j.latitude, lon=j.longitude,
-                    duration=j.duration, priority_score=10 if j.jp_priority == 'Urgent' else 1
-                ))
+        # Handle dict or object input (decided once, from the first job)
+        if available_jobs and isinstance(available_jobs[0], dict):
+            get = lambda j, key, default=None: j.get(key, default)
+        else:
+            get = lambda j, key, default=None: getattr(j, key, default)
+        opt_jobs = [
+            OptimizationJob(
+                id=get(j, 'work_order'), lat=get(j, 'latitude'), lon=get(j, 'longitude'),
+                duration=get(j, 'duration', 2.0), idx=i
+            )
+            for i, j in enumerate(available_jobs)
+        ]
+        # Higher is more important; a route's priority is priority_scores[route_idx].sum()
+        is_urgent = np.array([get(j, 'jp_priority') for j in available_jobs], dtype=object) == 'Urgent'
+        self.priority_scores = is_urgent.astype(np.int8) * np.int8(9) + np.int8(1)
+        self.durations = np.array([oj.duration for oj in opt_jobs], dtype=float)
+        self._build_distance_matrix(opt_jobs, start_location)
+
+        # Routes below are lists of job indices into these arrays (SoA)
 
         # 2. Initial Solution: Use your existing Greedy method (Nearest Neighbor)
         # This gives us a valid starting point.
-        current_route = self._greedy_initial_solution(opt_jobs, start_location, max_daily_hours)
+        current_route = self._greedy_initial_solution(max_daily_hours)
         
         # 3. Optimize with Simulated Annealing
         # We try to swap jobs in the sequence or swap a job in the route with one currently left out
-        best_route = self._simulated_annealing(current_route, opt_jobs, start_location, max_daily_hours)
+        best_route = self._simulated_annealing(current_route, max_daily_hours)
 
-        # 4. Map back to original objects
-        final_job_ids = [j.id for j in best_route]
-        final_jobs_original = [j for j in available_jobs if (j.get('work_order') if isinstance(j, dict) else j.work_order) in final_job_ids]
-        
-        # Sort original objects to match optimization order
-        final_jobs_ordered = []
-        for obj_id in final_job_ids:
-            for original in final_jobs_original:
-                oid = original.get('work_order') if isinstance(original, dict) else original.work_order
-                if oid == obj_id:
-                    final_jobs_ordered.append(original)
-                    break
-        
-        hours, miles = self.calculate_route_cost(best_route, start_location)
-        drive_hours = miles / self.avg_speed
+        # 4. Map back to original objects (indices are positions in available_jobs)
+        final_jobs_ordered = [available_jobs[k] for k in best_route]
         
-        last_loc = start_location
-        if best_route:
-            last_loc = (best_route[-1].lat, best_route[-1].lon)
+        if not best_route:
+            return final_jobs_ordered, 0.0, 0.0, start_location
 
-        return final_jobs_ordered, (hours - drive_hours), drive_hours, last_loc
+        work_hours = float(self.durations[best_route].sum())
+        drive_hours = self._order_miles(best_route) / self.avg_speed
+        last = opt_jobs[best_route[-1]]
 
-    def _greedy_initial_solution(self, pool: List[OptimizationJob], start_loc, max_hours):
+        return final_jobs_ordered, work_hours, drive_hours, (last.lat, last.lon)
+
+    def _greedy_initial_solution(self, max_hours) -> List[int]:
         """Recreates your logic to get a baseline."""
         route = []
-        remaining = pool.copy()
-        curr = start_loc
+        remaining_mask = np.ones(len(self.durations), dtype=bool)
+        dists = self.dist_start
         current_time = 0
         
-        while remaining:
-            # Find nearest
-            nearest = min(remaining, key=lambda x: self.haversine(curr[0], curr[1], x.lat, x.lon))
-            dist = self.haversine(curr[0], curr[1], nearest.lat, nearest.lon)
-            time_cost = (dist / self.avg_speed) + nearest.duration
+        while remaining_mask.any():
+            # Find nearest remaining job (visited ones masked out)
+            dists = np.where(remaining_mask, dists, np.inf)
+            nxt = int(dists.argmin())
+            time_cost = (dists[nxt] / self.avg_speed) + self.durations[nxt]
             
             if current_time + time_cost <= max_hours:
-                route.append(nearest)
+                route.append(nxt)
                 current_time += time_cost
-                curr = (nearest.lat, nearest.lon)
-                remaining.remove(nearest)
+                remaining_mask[nxt] = False
+                dists = self.dist_matrix[nxt]
             else:
                 break
         return route
 
-    def _simulated_annealing(self, initial_route: List[OptimizationJob], all_pool: List[OptimizationJob], start_loc, max_hours):
+    def _leg_miles(self, frm, to: int) -> float:
+        """Miles from job index frm (None = start location) to job index to."""
+        if frm is None:
+            return self.dist_start[to]
+        return self.dist_matrix[frm, to]
+
+    def _simulated_annealing(self, initial_route: List[int], max_hours) -> List[int]:
         """
-        Tries to improve the route by swapping order.
-        Objective: Minimize Distance while maximizing Priority Score.
+        Tries to improve the route by reordering it with 2-opt moves
+        (reversing a segment of the route).
+        Objective: minimize drive distance. priority_scores is not part of the
+        energy yet; the subset of jobs is fixed before this runs.
+        Routes are lists of job indices. Distances are symmetric, so a
+        reversal only changes the leg into the segment and the leg out of it;
+        those two legs are all that is priced per proposal.
         """
-        current_route = copy.deepcopy(initial_route)
-        best_route = copy.deepcopy(initial_route)
-        
+        n = len(initial_route)
+        if n < 2:
+            return initial_route[:]
+
+        current = initial_route[:]
+        best = current[:]
+
+        curr_m = self._order_miles(current)
+        work_hours = float(self.durations[current].sum())
+        best_m = curr_m
+
+        # Geometric cooling from T to T_min over one step per 2-opt pair
+        # (bounded), so the search effort follows the route length.
         T = 100.0
         T_min = 0.1
-        alpha = 0.99
+        iterations = min(max(n * (n - 1) // 2, 100), 20000)
+        alpha = (T_min / T) ** (1.0 / iterations)
+
+        # Per-call generator; all random draws made up front
+        rng = np.random.default_rng(self.seed)
+        moves = np.sort(rng.integers(0, n, size=(iterations, 2)), axis=1).tolist()
+        coin = rng.random(iterations).tolist()
         
-        while T > T_min:
-            i = random.randint(0, len(current_route) - 1) if current_route else 0
-            j = random.randint(0, len(current_route) - 1) if current_route else 0
-            
-            if not current_route:
-                break
+        for step in range(iterations):
+            i, j = moves[step]
 
-            # Create Neighbor: Swap two stops
-            new_route = copy.deepcopy(current_route)
-            new_route[i], new_route[j] = new_route[j], new_route[i]
+            # Neighbor: reverse current[i..j]; only the boundary legs change
+            before = current[i - 1] if i > 0 else None
+            after = current[j + 1] if j + 1 < len(current) else None
+            old_legs = self._leg_miles(before, current[i])
+            new_legs = self._leg_miles(before, current[j])
+            if after is not None:
+                old_legs += self.dist_matrix[current[j], after]
+                new_legs += self.dist_matrix[current[i], after]
             
             # Calculate Costs
-            curr_h, curr_m = self.calculate_route_cost(current_route, start_loc)
-            new_h, new_m = self.calculate_route_cost(new_route, start_loc)
+            new_m = curr_m + (new_legs - old_legs)
+            new_h = work_hours + (new_m / self.avg_speed)
             
             # Energy = Distance (we want to minimize)
             # If we wanted to include priority, we'd subtract priority from energy
@@ -168,11 +255,13 @@ class SmartRouter:
             # If valid (time constraint) and better energy (or prob acceptance)
             if new_h <= max_hours:
                 delta = new_energy - current_energy
-                if delta < 0 or random.random() < math.exp(-delta / T):
-                    current_route = new_route
-                    if new_energy < self.calculate_route_cost(best_route, start_loc)[1]:
-                        best_route = copy.deepcopy(new_route)
+                if delta < 0 or coin[step] < math.exp(-delta / T):
+                    current[i:j + 1] = current[i:j + 1][::-1]
+                    curr_m = new_m
+                    if new_energy < best_m:
+                        best = current[:]
+                        best_m = new_energy
             
             T *= alpha
             
-        return best_route
\ No newline at end of file
+        return best
@@ -4,10 +4,20 @@ Database Column Usage Analyzer
 Scans all code files to find which job_pool columns are actually being used
 """
 
+import mmap
 import os
 import re
-from pathlib import Path
+from array import array
+from bisect import bisect_right
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+
+try:
+    import ahocorasick  # pip install pyahocorasick (optional, faster scan)
+except ImportError:
+    ahocorasick = None
 
 # List of columns from job_pool table
 JOB_POOL_COLUMNS = [
@@ -20,58 +30,246 @@ JOB_POOL_COLUMNS = [
     'is_night', 'cluster_label'
 ]
 
-# File patterns to search
-FILE_PATTERNS = ['*.py', '*.html', '*.js', '*.sql']
+# File types to search, in report order
+FILE_SUFFIXES = ('.py', '.html', '.js', '.sql')
+
+# Directories never searched, and generated files not worth reading
+SKIP_DIRS = {'node_modules', 'venv', '.venv', '.git', '__pycache__', 'dist', 'build'}
+SKIP_SUFFIXES = ('.min.js', '.map', '.lock')
+MAX_FILE_BYTES = 4 * 1024 * 1024
+
+# Quoted ("col"), property (.col) and subscript (['col']) references are all
+# also whole-word matches, so a column is used on a line exactly when one of
+# the line's words is the column name. Each file is scanned once: with an
+# Aho-Corasick automaton over the column names when pyahocorasick is
+# installed, otherwise word by word with a single compiled pattern and a dict
+# lookup. Content is lowercased instead of using re.IGNORECASE.
+WORD_RE = re.compile(r'\w+')
+NEWLINE_RE = re.compile('\n')
+
+def _line_starts(text):
+    """Offset of the first character of every line in text."""
+    return [0] + [m.end() for m in NEWLINE_RE.finditer(text)]
+
+def _line_text(text, line_starts, line_no):
+    """Line line_no (1-based) of text, sliced out by offset without splitting."""
+    start = line_starts[line_no - 1]
+    end = line_starts[line_no] - 1 if line_no < len(line_starts) else len(text)
+    return text[start:end]
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == '_'
+
+def _build_automaton(wanted):
+    automaton = ahocorasick.Automaton()
+    for key, column in wanted.items():
+        automaton.add_word(key, (len(key), column))
+    automaton.make_automaton()
+    return automaton
+
+def _column_hits(lowered, wanted, automaton=None):
+    """Yield (offset, column) for every whole-word column name in lowered text."""
+    if automaton is None:
+        for match in WORD_RE.finditer(lowered):
+            column = wanted.get(match.group())
+            if column is not None:
+                yield match.start(), column
+        return
+    last = len(lowered) - 1
+    for end, (length, column) in automaton.iter(lowered):
+        start = end - length + 1
+        if start > 0 and _is_word_char(lowered[start - 1]):
+            continue
+        if end < last and _is_word_char(lowered[end + 1]):
+            continue
+        yield start, column
+
+# Scans of this many files or more are spread over worker processes; below
+# that, process start-up costs more than the scan itself.
+PARALLEL_MIN_FILES = 64
+
+# Files at least this big (bundles, dumps) are memory-mapped and scanned as
+# raw bytes instead of being read and decoded into one large str. The bytes
+# scan is word-by-word in Python, so ordinary source files stay on the
+# faster str path.
+MMAP_MIN_BYTES = 1024 * 1024
 
-def find_column_usage(directory, columns):
+WORD_BYTES_RE = re.compile(rb'\w+')
+NEWLINE_BYTES_RE = re.compile(rb'\n')
+
+_automata = {}  # per-process Aho-Corasick automaton, keyed by column tuple
+
+def _scan_text(content, wanted, automaton):
+    """(column, line, context) hits in decoded text, one per column per line."""
+    hits = []
+    lowered = content.lower()
+    line_starts = None  # offsets of each line, built on first hit
+    next_start = 0      # hits before this offset are on the current line
+
+    # Single pass over the file. Hits arrive in offset order, so the line is
+    # only looked up when a hit moves past it, and its context is built once.
+    for offset, column in _column_hits(lowered, wanted, automaton):
+        if offset >= next_start:
+            if line_starts is None:
+                line_starts = _line_starts(lowered)
+                # lower() keeps line breaks but can change the length of
+                # a few non-ASCII chars; only then re-index the original
+                text_starts = line_starts if len(lowered) == len(content) else _line_starts(content)
+            line_no = bisect_right(line_starts, offset)
+            next_start = line_starts[line_no] if line_no < len(line_starts) else len(lowered) + 1
+            line_columns = set()
+            context = None
+        if column in line_columns:
+            continue  # one entry per line
+        line_columns.add(column)
+        if context is None:
+            context = _line_text(content, text_starts, line_no).strip()[:100]  # First 100 chars
+        hits.append((column, line_no, context))
+    return hits
+
+def _scan_mapped(mm, wanted):
+    """Same as _scan_text() for a memory-mapped file; only hit lines get decoded."""
+    hits = []
+    wanted_bytes = {key.encode(): column for key, column in wanted.items()}
+    line_starts = None
+    next_start = 0
+    for match in WORD_BYTES_RE.finditer(mm):
+        column = wanted_bytes.get(match.group().lower())
+        if column is None:
+            continue
+        offset = match.start()
+        if offset >= next_start:
+            if line_starts is None:
+                line_starts = [0] + [m.end() for m in NEWLINE_BYTES_RE.finditer(mm)]
+            line_no = bisect_right(line_starts, offset)
+            next_start = line_starts[line_no] if line_no < len(line_starts) else len(mm) + 1
+            line_columns = set()
+            context = None
+        if column in line_columns:
+            continue
+        line_columns.add(column)
+        if context is None:
+            context = _line_text(mm, line_starts, line_no).decode('utf-8', errors='ignore').strip()[:100]
+        hits.append((column, line_no, context))
+    return hits
+
+def _scan_file(file_path, columns):
     """
-    Search for column usage in all code files
+    Scan one file. Returns (file_path, hits, error) where hits is a list of
+    (column, line, context) with one entry per column per line.
     """
-    usage = defaultdict(list)
-    files_searched = 0
-    
-    # Convert to Path object
-    search_dir = Path(directory)
-    
-    # Search through files
-    for pattern in FILE_PATTERNS:
-        for file_path in search_dir.rglob(pattern):
-            # Skip node_modules, venv, etc
-            if any(skip in str(file_path) for skip in ['node_modules', 'venv', '.git', '__pycache__']):
+    wanted = {column.lower(): column for column in columns}
+    automaton = None
+    if ahocorasick and wanted:
+        automaton = _automata.get(columns)
+        if automaton is None:
+            automaton = _automata[columns] = _build_automaton(wanted)
+
+    try:
+        if os.path.getsize(file_path) >= MMAP_MIN_BYTES:
+            with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if b'\0' in mm[:4096]:
+                    return file_path, [], None  # binary file
+                return file_path, _scan_mapped(mm, wanted), None
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            content = f.read()
+    except Exception as e:
+        return file_path, [], e
+
+    return file_path, _scan_text(content, wanted, automaton), None
+
+class ColumnHits:
+    """
+    Occurrences of one column, kept as parallel arrays (file index, line,
+    context) against a file table shared by all columns. Iterating yields
+    {'file', 'line', 'context'} dicts, built only when they are read.
+    """
+    __slots__ = ('file_table', 'file_idx', 'lines', 'contexts')
+
+    def __init__(self, file_table):
+        self.file_table = file_table
+        self.file_idx = array('I')
+        self.lines = array('I')
+        self.contexts = []
+
+    def append(self, file_index, line_no, context):
+        self.file_idx.append(file_index)
+        self.lines.append(line_no)
+        self.contexts.append(context)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __iter__(self):
+        file_table = self.file_table
+        for fi, line_no, context in zip(self.file_idx, self.lines, self.contexts):
+            yield {'file': file_table[fi], 'line': line_no, 'context': context}
+
+    def files(self):
+        """Names of the files this column occurs in."""
+        return {self.file_table[fi] for fi in set(self.file_idx)}
+
+def _walk_files(directory):
+    """
+    Yield (path, suffix rank) for every searchable file under directory.
+    One os.scandir walk: files of a directory first, then its subdirectories;
+    symlinked directories and SKIP_DIRS are not entered.
+    """
+    subdirs = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in SKIP_DIRS:
+                    subdirs.append(entry.path)
+                continue
+            name = entry.name
+            dot = name.rfind('.')
+            if dot < 0 or name[dot:] not in FILE_SUFFIXES:
+                continue
+            # Skip minified/generated and oversized files
+            if name.endswith(SKIP_SUFFIXES):
                 continue
-                
-            files_searched += 1
-            
             try:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                    file_name = str(file_path.relative_to(search_dir))
-                    
-                    # Search for each column
-                    for column in columns:
-                        # Different patterns to match column usage
-                        patterns = [
-                            rf'\b{column}\b',  # Exact word match
-                            rf'["\']]{column}["\']',  # In quotes
-                            rf'\.{column}\b',  # Object property
-                            rf'\[[\"\']]{column}[\"\']]\]',  # Dictionary/array access
-                        ]
-                        
-                        for pattern in patterns:
-                            if re.search(pattern, content, re.IGNORECASE):
-                                # Find line numbers where it appears
-                                lines = content.split('\n')
-                                for i, line in enumerate(lines, 1):
-                                    if re.search(pattern, line, re.IGNORECASE):
-                                        usage[column].append({
-                                            'file': file_name,
-                                            'line': i,
-                                            'context': line.strip()[:100]  # First 100 chars
-                                        })
-                                break  # Found in this file, move to next column
-                                
-            except Exception as e:
-                print(f"Error reading {file_path}: {e}")
+                if entry.stat().st_size > MAX_FILE_BYTES:
+                    continue
+            except OSError:
+                pass  # reported when the scan tries to open it
+            yield entry.path, FILE_SUFFIXES.index(name[dot:])
+    for subdir in subdirs:
+        yield from _walk_files(subdir)
+
+def find_column_usage(directory, columns, workers=None):
+    """
+    Search for column usage in all code files.
+    Files are scanned in parallel processes when there are enough of them;
+    workers caps the process count (default: CPU count).
+    """
+    file_table = []  # relative names of files with hits, indexed by ColumnHits
+    usage = defaultdict(partial(ColumnHits, file_table))
+
+    # Collect files up front, grouped by type (stable, so walk order holds within a type)
+    found = sorted(_walk_files(directory), key=lambda item: item[1])
+    files = [path for path, _ in found]
+    files_searched = len(files)
+
+    scan = partial(_scan_file, columns=tuple(columns))
+    if files_searched >= PARALLEL_MIN_FILES and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            results = list(ex.map(scan, files, chunksize=16))
+    else:
+        results = map(scan, files)
+
+    # Merge in file order
+    for file_path, hits, error in results:
+        if error is not None:
+            print(f"Error reading {file_path}: {error}")
+            continue
+        if not hits:
+            continue
+        file_index = len(file_table)
+        file_table.append(os.path.relpath(file_path, directory))
+        for column, line_no, context in hits:
+            usage[column].append(file_index, line_no, context)
     
     return usage, files_searched
 
@@ -112,12 +310,12 @@ def generate_report(usage, files_searched):
     
     for column, occurrences in sorted_used:
         # Get unique files
-        unique_files = set(occ['file'] for occ in occurrences)
+        unique_files = occurrences.files()
         print(f"\n✅ {column}")
         print(f"   Used in {len(unique_files)} files, {len(occurrences)} occurrences")
         
         # Show first few examples
-        for occ in occurrences[:3]:
+        for occ in islice(occurrences, 3):
             print(f"   - {occ['file']}:{occ['line']}")
             print(f"     {occ['context']}")
         
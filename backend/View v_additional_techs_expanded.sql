@@ -0,0 +1,22 @@
+-- Used by scheduler_api.get_all_additional_techs: each additional-tech row joined
+-- with its scheduled job and the tech's name, in the endpoint's response shape.
+-- The endpoint filters on date, so one request returns the final list.
+-- security_invoker keeps the caller's RLS policies on the underlying tables.
+
+CREATE OR REPLACE VIEW public.v_additional_techs_expanded
+WITH (security_invoker = true)
+AS
+    SELECT
+        a.work_order,
+        a.technician_id,
+        COALESCE(t.name, 'Tech ' || a.technician_id) AS tech_name,
+        s.date,
+        s.site_name,
+        s.site_city,
+        s.duration,
+        s.technician_id AS primary_tech_id,
+        s.assigned_tech_name AS primary_tech_name,
+        s.sow_1
+    FROM scheduled_job_additional_techs a
+    JOIN scheduled_jobs s ON s.work_order = a.work_order
+    LEFT JOIN technicians t ON t.technician_id = a.technician_id;
@@ -1,62 +1,175 @@
 # db_queries.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
+from functools import wraps
 from typing import Any, Dict, List, Optional, Tuple
 from supabase_client import sb_select
 
+# PostgREST puts IN lists in the URL, so long id lists are split into chunks
+# that are fetched concurrently and concatenated.
+IN_CHUNK_SIZE = 500
+IN_CHUNK_WORKERS = 8
+
+# Technician rows change rarely; repeat lookups within this window reuse
+# the last response instead of another round-trip.
+TECH_CACHE_TTL_SECONDS = 60
+
+# job_pool columns the schedulers actually read. Leaves out geom, audit
+# timestamps, address and import flags, which dominate the payload.
+JOB_POOL_COLUMNS = (
+    "work_order,site_name,site_city,site_state,latitude,longitude,"
+    "jp_status,jp_priority,due_date,sow_1,is_recurring_site,night_test,"
+    "days_til_due,tech_count,region,duration,cluster_id,cluster_label"
+)
+
+def _copy_result(value: Any) -> Any:
+    """
+    Shallow copy of a cached result: a list gets new row dicts and anything
+    with .copy() (dict, DataFrame) is copied one level, so callers can add or
+    replace top-level keys/rows. Nested values (lists inside rows or pool
+    dicts, arrays, tuples) are still shared with the cache; don't mutate them.
+    """
+    if isinstance(value, list):
+        return [dict(r) if isinstance(r, dict) else r for r in value]
+    if hasattr(value, "copy"):
+        return value.copy()
+    return value
+
+def ttl_cache(seconds: float, maxsize: int = 128):
+    """
+    Memoize a function's result per arguments for `seconds`, keeping at most
+    `maxsize` entries. Hits return a shallow copy (see _copy_result).
+    """
+    def deco(fn):
+        cache: Dict[Any, Tuple[float, Any]] = {}
+        # Sync endpoints run in a threadpool; the lock guards lookup/insert/evict,
+        # not the call itself, so a slow miss doesn't block other keys
+        lock = threading.Lock()
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (
+                tuple(tuple(a) if isinstance(a, list) else a for a in args),
+                tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in kwargs.items())),
+            )
+            now = time.monotonic()
+            try:
+                with lock:
+                    hit = cache.get(key)
+            except TypeError:  # unhashable argument (e.g. a dict): call through uncached
+                return fn(*args, **kwargs)
+            if hit is not None and now - hit[0] < seconds:
+                return _copy_result(hit[1])
+            result = fn(*args, **kwargs)
+            with lock:
+                cache.pop(key, None)
+                if len(cache) >= maxsize:
+                    del cache[next(iter(cache))]  # oldest entry; dicts keep insertion order
+                cache[key] = (now, result)
+            return _copy_result(result)
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return deco
+
+def _iso(d: Any) -> str:
+    """ISO string for a date-like filter value; plain strings pass through."""
+    return d.isoformat() if hasattr(d, "isoformat") else str(d)
+
+def _chunk(xs: List[Any], n: int = IN_CHUNK_SIZE) -> List[List[Any]]:
+    return [xs[i:i + n] for i in range(0, len(xs), n)]
+
+def select_in(
+    table: str,
+    column: str,
+    values: List[Any],
+    filters: Optional[List[Tuple[str, str, Any]]] = None,
+    columns: str = "*",
+) -> List[Dict[str, Any]]:
+    """sb_select with an ("in", values) filter on column, chunked for long lists."""
+    values = list(values)
+    extra = list(filters or [])
+    chunks = _chunk(values)
+    if len(chunks) <= 1:
+        return sb_select(table, filters=[(column, "in", values)] + extra, columns=columns)
+    with ThreadPoolExecutor(max_workers=min(IN_CHUNK_WORKERS, len(chunks))) as ex:
+        results = list(ex.map(
+            lambda c: sb_select(table, filters=[(column, "in", c)] + extra, columns=columns),
+            chunks,
+        ))
+    return [r for rs in results for r in rs]
+
 def get_job_pool(
     due_start: date,
     due_end: date,
     states: Optional[List[str]] = None,
     statuses: Tuple[str, ...] = ("Call", "Waiting to Schedule"),
+    columns: str = JOB_POOL_COLUMNS,
 ) -> List[Dict[str, Any]]:
     filters: List[Tuple[str, str, Any]] = [
-        ("due_date", "gte", str(due_start)),
-        ("due_date", "lte", str(due_end)),
+        ("due_date", "gte", _iso(due_start)),
+        ("due_date", "lte", _iso(due_end)),
         ("jp_status", "in", list(statuses)),
     ]
     if states:
         filters.append(("state", "in", states))
-    return sb_select("job_pool", filters=filters)
+    return sb_select("job_pool", filters=filters, columns=columns)
 
+@ttl_cache(TECH_CACHE_TTL_SECONDS)
 def get_technicians(active_only: bool = True) -> List[Dict[str, Any]]:
     filters: Optional[List[Tuple[str, str, Any]]] = [("active", "eq", True)] if active_only else None
     return sb_select("technicians", filters=filters)
 
 def get_job_eligibility_for_jobs(work_orders: Optional[List[int]] = None) -> List[Dict[str, Any]]:
-    filters = [("work_order", "in", work_orders)] if work_orders else None
-    return sb_select("job_technician_eligibility", filters=filters)
+    if work_orders:
+        return select_in("job_technician_eligibility", "work_order", work_orders)
+    return sb_select("job_technician_eligibility")
 
 def get_blackouts(tech_ids: List[int], start: date, end: date) -> List[Dict[str, Any]]:
     if not tech_ids:
         return []
-    return sb_select(
-        "blackouts",
-        filters=[("technician_id", "in", tech_ids), ("date", "gte", str(start)), ("date", "lte", str(end))],
+    return select_in(
+        "blackouts", "technician_id", tech_ids,
+        filters=[("date", "gte", _iso(start)), ("date", "lte", _iso(end))],
     )
 
 def get_existing_schedule(tech_ids: List[int], start: date, end: date) -> List[Dict[str, Any]]:
     if not tech_ids:
         return []
-    return sb_select(
-        "scheduled_jobs",
-        filters=[("technician_id", "in", tech_ids), ("date", "gte", str(start)), ("date", "lte", str(end))],
+    return select_in(
+        "scheduled_jobs", "technician_id", tech_ids,
+        filters=[("date", "gte", _iso(start)), ("date", "lte", _iso(end))],
     )
 
+@ttl_cache(TECH_CACHE_TTL_SECONDS)
 def get_capacities(tech_ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
-    filters = [("id", "in", tech_ids)] if tech_ids else None
-    return sb_select("technicians", filters=filters, columns="id,max_daily_hours,max_weekly_hours,night_eligible")
+    columns = "id,max_daily_hours,max_weekly_hours,night_eligible"
+    if tech_ids:
+        return select_in("technicians", "id", tech_ids, columns=columns)
+    return sb_select("technicians", columns=columns)
 
 import pandas as pd
 from typing import Optional, List, Any
 
 def _to_df(rows: Optional[List[dict]]) -> pd.DataFrame:
-    return pd.DataFrame(rows or [])
+    if not rows:
+        return pd.DataFrame()
+    # Every row in a PostgREST response has the same keys, so take the column
+    # list from the first row instead of letting pandas union all rows' keys.
+    return pd.DataFrame.from_records(rows, columns=list(rows[0]))
 
 def job_pool_df(
     due_start: Any = None,
     due_end: Any = None,
     states: Optional[List[str]] = None,
-    statuses: Any = None  # None or "*" means no status filter
+    statuses: Any = None,  # None or "*" means no status filter
+    columns: str = JOB_POOL_COLUMNS,  # "*" for every column
 ):
     #    Old code calls _jp() with no args. Support that by returning all rows.
    # If dates are provided, filter by due_date window and optional states/statuses.
@@ -64,11 +177,11 @@ def job_pool_df(
     from supabase_client import sb_select  # local import to avoid cycles
 
     if due_start is None or due_end is None:
-        rows = sb_select("job_pool")  # no filters, full table
+        rows = sb_select("job_pool", columns=columns)  # no filters, every row
         return _to_df(rows)
 
-    ds = str(due_start)
-    de = str(due_end)
+    ds = _iso(due_start)
+    de = _iso(due_end)
     filters = [("due_date", "gte", ds), ("due_date", "lte", de)]
     if states:
         filters.append(("state", "in", list(states)))
@@ -78,15 +191,13 @@ def job_pool_df(
         else:
             stat_list = [str(statuses)]
         filters.append(("jp_status", "in", stat_list))
-    rows = sb_select("job_pool", filters=filters)
+    rows = sb_select("job_pool", filters=filters, columns=columns)
     return _to_df(rows)
 
 def eligibility_df(work_orders: Optional[List[int]] = None):
-    from supabase_client import sb_select
-    filters = [("work_order", "in", list(work_orders))] if work_orders else None
-    rows = sb_select("job_technician_eligibility", filters=filters)
-    return _to_df(rows)
+    return _to_df(get_job_eligibility_for_jobs(list(work_orders) if work_orders else None))
 
+@ttl_cache(TECH_CACHE_TTL_SECONDS)
 def technicians_df(active_only: bool = True):
     """
     Return technician DataFrame with legacy column names:
@@ -102,7 +213,6 @@ def technicians_df(active_only: bool = True):
         "home_lat": "home_latitude",
         "home_lng": "home_longitude",
     }
-    for old, new in rename_map.items():
-        if old in df.columns and new not in df.columns:
-            df = df.rename(columns={old: new})
+    rename_map = {old: new for old, new in rename_map.items() if new not in df.columns}
+    df.columns = [rename_map.get(c, c) for c in df.columns]
     return df
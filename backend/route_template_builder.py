@@ -8,13 +8,68 @@ Workflow:
 3. Match sites to current work orders in job_pool
 4. Return enriched pool for scheduling
 """
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime, timedelta
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Union
 from collections import defaultdict
 from dataclasses import dataclass
-from math import cos, radians, sin, asin, sqrt
+from functools import lru_cache
+from heapq import nlargest
+from operator import itemgetter
+from math import cos, radians
+import numpy as np
+from postgrest.exceptions import APIError
+from db_queries import ttl_cache
 from supabase_client import supabase_client
 
+# Historical lookups (one per year) are independent round-trips, so they
+# run concurrently on this many threads.
+HISTORY_QUERY_WORKERS = 8
+
+# Technician names and site regions rarely change within a scheduling session
+LOOKUP_CACHE_TTL_SECONDS = 300
+
+# Route templates for a reference date are reused while a user builds pools
+# from several of them
+ROUTES_CACHE_TTL_SECONDS = 120
+
+# Built pools are reused while the UI re-renders or re-requests the same template
+POOL_CACHE_TTL_SECONDS = 60
+
+# job_history fields read when looking for historical pairings
+# (work_order is the pagination key)
+HISTORY_COLUMNS = 'work_order, scheduled_date, technician_id, site_id, site_name, sow_1, region'
+
+# Rows per job_history page; stays under PostgREST's default 1000-row cap
+HISTORY_PAGE_SIZE = 1000
+
+EARTH_RADIUS_MILES = 3959
+
+# PostgREST / Postgres error codes for "no such function" (RPC not deployed)
+MISSING_FUNCTION_CODES = ('PGRST202', '42883')
+
+
+def _miles_from(lats: np.ndarray, lons: np.ndarray, center_lat: float, center_lon: float) -> np.ndarray:
+    """Haversine miles from the center to each (lat, lon) point, all in degrees."""
+    lat1, lon1 = radians(center_lat), radians(center_lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(a))
+
+
+# Up to this radius the equirectangular approximation stays within ~0.3%
+# (under 0.2 miles) of haversine at 24-50N, without the per-point trig.
+# Error grows with distance (~1.2% at 200 miles), so wider searches use haversine.
+# Only for reported distances, never for deciding whether a job is in range.
+EQUIRECT_MAX_MILES = 50
+
+
+def _flat_miles_from(lats: np.ndarray, lons: np.ndarray, center_lat: float, center_lon: float) -> np.ndarray:
+    """Equirectangular approximation of _miles_from() for short distances."""
+    dx = (lons - center_lon) * cos(radians(center_lat))
+    dy = lats - center_lat
+    return EARTH_RADIUS_MILES * radians(1) * np.sqrt(dx * dx + dy * dy)
+
 
 @dataclass
 class RouteTemplate:
@@ -39,8 +94,9 @@ def get_week_number(d: date) -> int:
     return d.isocalendar()[1]
 
 
+@lru_cache(maxsize=512)
 def get_week_start_end(year: int, week_number: int) -> Tuple[date, date]:
-    """Get the Monday and Friday of a given ISO week"""
+    """Get the Monday and Friday of a given ISO week (memoized; a few years of weeks fit)"""
     # Find Jan 4 (always in week 1) and work from there
     jan4 = date(year, 1, 4)
     week1_monday = jan4 - timedelta(days=jan4.weekday())
@@ -49,7 +105,27 @@ def get_week_start_end(year: int, week_number: int) -> Tuple[date, date]:
     return target_monday, target_friday
 
 
-def get_last_month_routes(reference_date: str = None) -> Dict:
+@ttl_cache(LOOKUP_CACHE_TTL_SECONDS, maxsize=4)
+def _load_tech_names() -> Dict[int, str]:
+    """technician_id -> name for every technician."""
+    tech_result = supabase_client().table('technicians').select('technician_id, name').execute()
+    return {t['technician_id']: t['name'] for t in (tech_result.data or [])}
+
+
+@ttl_cache(LOOKUP_CACHE_TTL_SECONDS)
+def _load_site_regions(site_ids: Tuple[int, ...]) -> Dict[int, str]:
+    """site_id -> region for the given sites. Pass a sorted tuple so equal sets share an entry."""
+    if not site_ids:
+        return {}
+    sites_result = supabase_client().table('sites')\
+        .select('site_id, region')\
+        .in_('site_id', list(site_ids))\
+        .execute()
+    return {s['site_id']: s.get('region') for s in (sites_result.data or [])}
+
+
+@ttl_cache(ROUTES_CACHE_TTL_SECONDS, maxsize=8)
+def get_last_month_routes(reference_date: str = None, top_k: Optional[int] = None) -> Dict:
     """
     Get routes from approximately 4 weeks ago (last month's equivalent week).
     Groups jobs by technician + week to identify route patterns.
@@ -57,6 +133,7 @@ def get_last_month_routes(reference_date: str = None) -> Dict:
     Args:
         reference_date: The date we're scheduling FOR (YYYY-MM-DD). 
                        We'll look ~4 weeks back from this date.
+        top_k: Optional. Only return the top_k biggest routes
     
     Returns:
         Dict with routes grouped by tech and week
@@ -111,15 +188,8 @@ def get_last_month_routes(reference_date: str = None) -> Dict:
         }
     
     # Get regions for site_ids from sites table
-    site_ids = list(set(j.get('site_id') for j in result.data if j.get('site_id')))
-    site_regions = {}
-    if site_ids:
-        sites_result = sb.table('sites')\
-            .select('site_id, region')\
-            .in_('site_id', site_ids)\
-            .execute()
-        if sites_result.data:
-            site_regions = {s['site_id']: s.get('region') for s in sites_result.data}
+    site_ids = {site_id for j in result.data if (site_id := j.get('site_id'))}
+    site_regions = _load_site_regions(tuple(sorted(site_ids)))
     
     # Add region to each job
     for job in result.data:
@@ -127,37 +197,42 @@ def get_last_month_routes(reference_date: str = None) -> Dict:
             job['region'] = site_regions.get(job['site_id'])
     
     # Get technician names
-    tech_result = sb.table('technicians').select('technician_id, name').execute()
-    tech_names = {t['technician_id']: t['name'] for t in (tech_result.data or [])}
+    tech_names = _load_tech_names()
     
     # Group by technician + week
     routes_by_tech_week = defaultdict(lambda: {
         'jobs': [],
         'site_ids': set(),
-        'site_names': [],
+        'site_names': set(),
         'regions': set(),
         'dates': set()
     })
     
+    # A month of jobs spans only a few dozen distinct dates, so each date
+    # string is parsed to its "year_Wweek" suffix once
+    week_suffixes = {}
+    
     for job in result.data:
         tech_id = job.get('technician_id')
         # Use 'date' field (from scheduled_jobs) or 'scheduled_date' (from job_history)
         date_str = job.get('date') or job.get('scheduled_date')
         if not date_str:
             continue
-        sched_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-        week_num = get_week_number(sched_date)
-        year = sched_date.year
+        week_suffix = week_suffixes.get(date_str)
+        if week_suffix is None:
+            sched_date = date.fromisoformat(date_str)
+            week_suffix = week_suffixes[date_str] = f"{sched_date.year}_W{get_week_number(sched_date)}"
         
-        key = f"{tech_id}_{year}_W{week_num}"
+        key = f"{tech_id}_{week_suffix}"
         
-        routes_by_tech_week[key]['jobs'].append(job)
+        route = routes_by_tech_week[key]
+        route['jobs'].append(job)
         if job.get('site_id'):
-            routes_by_tech_week[key]['site_ids'].add(job['site_id'])
-        routes_by_tech_week[key]['site_names'].append(job.get('site_name', 'Unknown'))
+            route['site_ids'].add(job['site_id'])
+        route['site_names'].add(job.get('site_name', 'Unknown'))
         if job.get('region'):
-            routes_by_tech_week[key]['regions'].add(job['region'])
-        routes_by_tech_week[key]['dates'].add(date_str)
+            route['regions'].add(job['region'])
+        route['dates'].add(date_str)
     
     # Convert to list of RouteTemplate objects
     routes = []
@@ -183,7 +258,7 @@ def get_last_month_routes(reference_date: str = None) -> Dict:
             'year': year,
             'month': week_start.month,
             'site_ids': list(data['site_ids']),
-            'site_names': list(set(data['site_names'])),  # Dedupe
+            'site_names': list(data['site_names']),
             'regions': list(data['regions']),
             'total_jobs': len(data['jobs']),
             'total_hours': total_hours,
@@ -191,7 +266,10 @@ def get_last_month_routes(reference_date: str = None) -> Dict:
         })
     
     # Sort by total_jobs descending (biggest routes first)
-    routes.sort(key=lambda r: -r['total_jobs'])
+    if top_k is not None and top_k < len(routes):
+        routes = nlargest(top_k, routes, key=itemgetter('total_jobs'))
+    else:
+        routes.sort(key=itemgetter('total_jobs'), reverse=True)
     
     return {
         "success": True,
@@ -204,6 +282,52 @@ def get_last_month_routes(reference_date: str = None) -> Dict:
     }
 
 
+def _fetch_history_weeks(history_year: int, weeks: List[int]) -> List[Tuple[int, List[Dict]]]:
+    """
+    job_history rows for several ISO weeks of one year in a single query,
+    read in work_order pages so no window is cut off at the row cap.
+    Returns (week, rows) pairs in the order of weeks, skipping invalid weeks.
+    """
+    windows = []
+    for week_num in weeks:
+        try:
+            week_start, week_end = get_week_start_end(history_year, week_num)
+        except:
+            continue
+        windows.append((week_num, str(week_start), str(week_end)))
+    
+    if not windows:
+        return []
+    
+    # One OR of date windows instead of a round-trip per week
+    date_windows = ','.join(
+        f'and(scheduled_date.gte.{start},scheduled_date.lte.{end})'
+        for _, start, end in windows
+    )
+    buckets = [[] for _ in windows]
+    last_work_order = None
+    while True:
+        query = supabase_client().table('job_history')\
+            .select(HISTORY_COLUMNS)\
+            .or_(date_windows)
+        if last_work_order is not None:
+            query = query.gt('work_order', last_work_order)
+        page = query.order('work_order').limit(HISTORY_PAGE_SIZE).execute().data or []
+        
+        # Bucket each page into its weeks as it arrives
+        for r in page:
+            scheduled = (r.get('scheduled_date') or '')[:10]
+            for bucket, (_, start, end) in zip(buckets, windows):
+                if start <= scheduled <= end:
+                    bucket.append(r)
+        
+        if len(page) < HISTORY_PAGE_SIZE:
+            break
+        last_work_order = page[-1]['work_order']
+    
+    return [(week_num, bucket) for (week_num, _, _), bucket in zip(windows, buckets)]
+
+
 def find_historically_paired_sites(
     site_ids: List[int],
     reference_week: int,
@@ -224,8 +348,6 @@ def find_historically_paired_sites(
     Returns:
         Dict with historically paired sites and their frequency
     """
-    sb = supabase_client()
-    
     if not site_ids:
         return {"success": False, "error": "No site IDs provided"}
     
@@ -243,74 +365,74 @@ def find_historically_paired_sites(
     
     # Find all historical weeks that have significant overlap with our sites
     matching_weeks = []
-    paired_sites = defaultdict(lambda: {'count': 0, 'site_name': None, 'sow_1': None, 'region': None})
+    paired_counts = defaultdict(int)
+    paired_info = {}
+    
+    # One query per year (all its weeks at once), years fetched concurrently,
+    # then processed in the original year/week order
+    history_years = [current_year - year_offset for year_offset in range(1, years_back + 1)]
+    if history_years:
+        with ThreadPoolExecutor(max_workers=min(HISTORY_QUERY_WORKERS, len(history_years))) as ex:
+            year_weeks = list(ex.map(lambda y: _fetch_history_weeks(y, weeks_to_check), history_years))
+    else:
+        year_weeks = []
+    searches = [
+        (history_year, week_num, rows)
+        for history_year, weeks in zip(history_years, year_weeks)
+        for week_num, rows in weeks
+    ]
+    
+    template_sites = set(site_ids)  # built once; membership tests below are O(1)
     
-    for year_offset in range(1, years_back + 1):
-        history_year = current_year - year_offset
+    for history_year, week_num, rows in searches:
+        if not rows:
+            continue
         
-        for week_num in weeks_to_check:
-            # Get the date range for this week
-            try:
-                week_start, week_end = get_week_start_end(history_year, week_num)
-            except:
-                continue
-            
-            # Query jobs from this week
-            result = sb.table('job_history')\
-                .select('*')\
-                .gte('scheduled_date', str(week_start))\
-                .lte('scheduled_date', str(week_end))\
-                .execute()
-            
-            if not result.data:
+        # Group by technician for this week
+        by_tech = defaultdict(list)
+        for job in rows:
+            by_tech[job.get('technician_id')].append(job)
+        
+        # Check each tech's week for overlap with our site_ids
+        for tech_id, tech_jobs in by_tech.items():
+            # Overlap can't exceed the tech's job count; skip short weeks early
+            if len(tech_jobs) < min_overlap:
                 continue
+            tech_site_ids = {sid for j in tech_jobs if (sid := j.get('site_id'))}
             
-            # Group by technician for this week
-            by_tech = defaultdict(list)
-            for job in result.data:
-                tech_id = job.get('technician_id')
-                by_tech[tech_id].append(job)
+            # Count overlap
+            overlap_count = len(tech_site_ids & template_sites)
             
-            # Check each tech's week for overlap with our site_ids
-            for tech_id, tech_jobs in by_tech.items():
-                tech_site_ids = set(j.get('site_id') for j in tech_jobs if j.get('site_id'))
-                
-                # Count overlap
-                overlap = tech_site_ids.intersection(set(site_ids))
-                overlap_count = len(overlap)
+            if overlap_count >= min_overlap:
+                # This is a matching route! Record the OTHER sites
+                matching_weeks.append({
+                    'year': history_year,
+                    'week': week_num,
+                    'tech_id': tech_id,
+                    'overlap_count': overlap_count,
+                    'total_jobs': len(tech_jobs)
+                })
                 
-                if overlap_count >= min_overlap:
-                    # This is a matching route! Record the OTHER sites
-                    matching_weeks.append({
-                        'year': history_year,
-                        'week': week_num,
-                        'tech_id': tech_id,
-                        'overlap_count': overlap_count,
-                        'total_jobs': len(tech_jobs)
-                    })
-                    
-                    # Find sites that are NOT in our original cluster
-                    for job in tech_jobs:
-                        job_site_id = job.get('site_id')
-                        if job_site_id and job_site_id not in site_ids:
-                            # This is a historically paired site!
-                            paired_sites[job_site_id]['count'] += 1
-                            paired_sites[job_site_id]['site_name'] = job.get('site_name')
-                            paired_sites[job_site_id]['sow_1'] = job.get('sow_1')
-                            paired_sites[job_site_id]['region'] = job.get('region')
-    
+                # Sites NOT in our original cluster are historically paired;
+                # the latest row's name/sow/region wins
+                for job in tech_jobs:
+                    job_site_id = job.get('site_id')
+                    if job_site_id and job_site_id not in template_sites:
+                        paired_counts[job_site_id] += 1
+                        paired_info[job_site_id] = job
+
     # Convert to list and sort by frequency
     paired_list = [
         {
             'site_id': site_id,
-            'site_name': data['site_name'],
-            'sow_1': data['sow_1'],
-            'region': data['region'],
-            'times_paired': data['count']
+            'site_name': (job := paired_info[site_id]).get('site_name'),
+            'sow_1': job.get('sow_1'),
+            'region': job.get('region'),
+            'times_paired': count
         }
-        for site_id, data in paired_sites.items()
+        for site_id, count in paired_counts.items()
     ]
-    paired_list.sort(key=lambda x: -x['times_paired'])
+    paired_list.sort(key=itemgetter('times_paired'), reverse=True)
     
     return {
         "success": True,
@@ -333,29 +455,39 @@ def match_sites_to_current_jobs(site_ids: List[int], due_date_end: str = None) -
         site_ids: List of site IDs to find jobs for
         due_date_end: Optional. Only include jobs due on or before this date (YYYY-MM-DD)
     """
-    sb = supabase_client()
-    
-    if not site_ids:
-        return {"success": False, "error": "No site IDs provided"}
-    
-    # Query job_pool for these sites
-    # Only get jobs that are ready to schedule (Call or Waiting to Schedule)
-    query = sb.table('job_pool')\
-        .select('*')\
-        .in_('site_id', site_ids)\
-        .in_('jp_status', ['Call', 'Waiting to Schedule'])
-    
-    # Apply due date filter if provided
-    if due_date_end:
-        query = query.lte('due_date', due_date_end)
+    return match_site_groups_to_current_jobs([site_ids], due_date_end=due_date_end)[0]
+
+
+def match_site_groups_to_current_jobs(site_groups: List[List[int]], due_date_end: str = None) -> List[Dict]:
+    """
+    match_sites_to_current_jobs() for several site ID lists at once: one
+    job_pool query and one sites query for the union, split back per group.
     
-    result = query.execute()
+    Returns one result dict per group, in the order given.
+    """
+    sb = supabase_client()
     
-    found_jobs = result.data or []
+    all_site_ids = list({site_id for group in site_groups for site_id in group})
+    found_jobs = []
+    if all_site_ids:
+        # Query job_pool for these sites
+        # Only get jobs that are ready to schedule (Call or Waiting to Schedule)
+        query = sb.table('job_pool')\
+            .select('*')\
+            .in_('site_id', all_site_ids)\
+            .in_('jp_status', ['Call', 'Waiting to Schedule'])
+        
+        # Apply due date filter if provided
+        if due_date_end:
+            query = query.lte('due_date', due_date_end)
+        
+        result = query.execute()
+        
+        found_jobs = result.data or []
     
     # Track which sites have jobs vs missing
     found_site_ids = set(j.get('site_id') for j in found_jobs if j.get('site_id'))
-    missing_site_ids = set(site_ids) - found_site_ids
+    missing_site_ids = set(all_site_ids) - found_site_ids
     
     # Get site info for missing ones
     missing_sites = []
@@ -366,13 +498,22 @@ def match_sites_to_current_jobs(site_ids: List[int], due_date_end: str = None) -
             .execute()
         missing_sites = sites_result.data or []
     
-    return {
-        "success": True,
-        "jobs": found_jobs,
-        "jobs_found": len(found_jobs),
-        "missing_sites": missing_sites,
-        "missing_count": len(missing_site_ids)
-    }
+    results = []
+    for site_ids in site_groups:
+        if not site_ids:
+            results.append({"success": False, "error": "No site IDs provided"})
+            continue
+        group = set(site_ids)
+        group_jobs = [j for j in found_jobs if j.get('site_id') in group]
+        group_missing = group & missing_site_ids
+        results.append({
+            "success": True,
+            "jobs": group_jobs,
+            "jobs_found": len(group_jobs),
+            "missing_sites": [s for s in missing_sites if s.get('site_id') in group_missing],
+            "missing_count": len(group_missing)
+        })
+    return results
 
 
 def get_nearby_annuals(
@@ -428,21 +569,38 @@ def get_nearby_annuals(
     else:
         due_cutoff = str(today + timedelta(days=30))
     
-    # Query for annual jobs near the centroid
-    # Using a bounding box first, then calculate actual distance
-    # Rough conversion: 1 degree lat ~ 69 miles, 1 degree lon ~ varies by latitude
-    lat_range = max_distance_miles / 69
-    lon_range = max_distance_miles / (69 * abs(cos(center_lat * 3.14159 / 180)) or 1)
-    
-    result = sb.table('job_pool')\
-        .select('*')\
-        .in_('jp_status', ['Call', 'Waiting to Schedule'])\
-        .lte('due_date', due_cutoff)\
-        .gte('latitude', center_lat - lat_range)\
-        .lte('latitude', center_lat + lat_range)\
-        .gte('longitude', center_lon - lon_range)\
-        .lte('longitude', center_lon + lon_range)\
-        .execute()
+    # Query for annual jobs near the centroid.
+    # nearby_annual_jobs (Function nearby_annual_jobs.sql) does the radius,
+    # MOI and template-site filtering in PostGIS on an indexed geography.
+    from_rpc = True
+    try:
+        result = sb.rpc('nearby_annual_jobs', {
+            'center_lat': center_lat,
+            'center_lon': center_lon,
+            'radius_miles': max_distance_miles,
+            'due_cutoff': due_cutoff,
+            'exclude_site_ids': site_ids
+        }).execute()
+    except APIError as e:
+        if e.code not in MISSING_FUNCTION_CODES:
+            raise
+        # Function not deployed: use a bounding box, then calculate actual distance
+        # Rough conversion: 1 degree lat ~ 69 miles, 1 degree lon ~ varies by latitude
+        print(f"nearby_annual_jobs unavailable ({e}), using bounding box query")
+        from_rpc = False
+        lat_range = max_distance_miles / 69
+        lon_range = max_distance_miles / (69 * max(abs(cos(radians(center_lat))), 1e-6))
+        
+        result = sb.table('job_pool')\
+            .select('*')\
+            .in_('jp_status', ['Call', 'Waiting to Schedule'])\
+            .lte('due_date', due_cutoff)\
+            .gte('latitude', center_lat - lat_range)\
+            .lte('latitude', center_lat + lat_range)\
+            .gte('longitude', center_lon - lon_range)\
+            .lte('longitude', center_lon + lon_range)\
+            .or_('sow_1.is.null,sow_1.not.ilike.*MOI*')\
+            .execute()
     
     if not result.data:
         return {
@@ -451,48 +609,57 @@ def get_nearby_annuals(
             "center": {"lat": center_lat, "lon": center_lon}
         }
     
-    # Filter out MOI jobs (we only want annuals) and jobs already in our site list
+    # MOI jobs (we only want annuals) were filtered out by the query.
+    # Filter out jobs already in our site list (the RPC does this too)
     # Also calculate actual distance and priority flag
     
-    def haversine(lat1, lon1, lat2, lon2):
-        """Calculate distance in miles between two points"""
-        R = 3959  # Earth radius in miles
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        return 2 * R * asin(sqrt(a))
-    
-    annuals = []
+    template_sites = set(site_ids)
+    candidates = []
     for job in result.data:
-        # Skip if it's an MOI job
-        sow = job.get('sow_1', '') or ''
-        if 'MOI' in sow.upper():
-            continue
-        
         # Skip if it's one of the template sites
-        if job.get('site_id') in site_ids:
+        if job.get('site_id') in template_sites:
             continue
         
-        # Calculate actual distance
-        job_lat = job.get('latitude')
-        job_lon = job.get('longitude')
-        if job_lat and job_lon:
-            distance = haversine(center_lat, center_lon, float(job_lat), float(job_lon))
-            
-            if distance <= max_distance_miles:
-                # Check if priority (due within priority window)
-                due_date = job.get('due_date')
-                is_priority = False
-                if due_date:
-                    due_dt = datetime.strptime(due_date, '%Y-%m-%d').date()
-                    is_priority = due_dt <= priority_cutoff
-                
-                annuals.append({
-                    **job,
-                    'distance_from_route_center': round(distance, 1),
-                    'is_priority': is_priority
-                })
+        if job.get('latitude') and job.get('longitude'):
+            candidates.append(job)
+    
+    # Distance (miles) from the route center to every candidate at once. The flat
+    # approximation is only used for the reported distance of RPC rows; the
+    # fallback's radius check needs exact haversine so edge jobs aren't lost.
+    if from_rpc and max_distance_miles <= EQUIRECT_MAX_MILES:
+        miles_from = _flat_miles_from
+    else:
+        miles_from = _miles_from
+    distances = miles_from(
+        np.array([float(j['latitude']) for j in candidates], dtype=np.float64),
+        np.array([float(j['longitude']) for j in candidates], dtype=np.float64),
+        float(center_lat),
+        float(center_lon)
+    )
+    
+    # The RPC already applied the radius (ST_DWithin on the sphere); re-filtering
+    # here would drop its edge rows over rounding. The bounding box is a
+    # superset, so only that path needs the radius check.
+    if from_rpc:
+        keep = range(len(candidates))
+    else:
+        keep = np.flatnonzero(distances <= max_distance_miles)
+    
+    annuals = []
+    for i in keep:
+        job = candidates[i]
+        # Check if priority (due within priority window)
+        due_date = job.get('due_date')
+        is_priority = False
+        if due_date:
+            due_dt = datetime.strptime(due_date, '%Y-%m-%d').date()
+            is_priority = due_dt <= priority_cutoff
+        
+        annuals.append({
+            **job,
+            'distance_from_route_center': round(float(distances[i]), 1),
+            'is_priority': is_priority
+        })
     
     # Sort: priority first, then by distance
     annuals.sort(key=lambda x: (not x['is_priority'], x['distance_from_route_center']))
@@ -507,8 +674,9 @@ def get_nearby_annuals(
     }
 
 
+@ttl_cache(POOL_CACHE_TTL_SECONDS, maxsize=64)
 def build_pool_from_template(
-    route_id: str,
+    route_id: Union[str, Dict],
     reference_date: str = None,
     due_date_end: str = None,
     priority_within_days: int = 10,
@@ -525,7 +693,8 @@ def build_pool_from_template(
     3. Nearby annuals due soon
     
     Args:
-        route_id: The route template ID (e.g., "tech_5_2024_W50")
+        route_id: The route template ID (e.g., "tech_5_2024_W50"), or a route
+                  dict from get_last_month_routes() to skip the lookup
         reference_date: The date we're scheduling FOR (YYYY-MM-DD) - needed to find the right routes
         due_date_end: Only include jobs due on or before this date (YYYY-MM-DD)
         priority_within_days: Flag annuals due within this many days as priority
@@ -536,21 +705,21 @@ def build_pool_from_template(
     Returns:
         Dict with categorized job pool
     """
-    # First, get the route template details (pass reference_date to look at the same date range)
-    routes_data = get_last_month_routes(reference_date)
-    
-    if not routes_data.get('success') or not routes_data.get('routes'):
-        return {"success": False, "error": "Could not load route templates"}
-    
-    # Find the specific route
-    route = None
-    for r in routes_data['routes']:
-        if r['route_id'] == route_id:
-            route = r
-            break
-    
-    if not route:
-        return {"success": False, "error": f"Route {route_id} not found"}
+    if isinstance(route_id, dict):
+        route = route_id
+        route_id = route['route_id']
+    else:
+        # First, get the route template details (pass reference_date to look at the same date range)
+        routes_data = get_last_month_routes(reference_date)
+        
+        if not routes_data.get('success') or not routes_data.get('routes'):
+            return {"success": False, "error": "Could not load route templates"}
+        
+        # Find the specific route
+        route = next((r for r in routes_data['routes'] if r['route_id'] == route_id), None)
+        
+        if not route:
+            return {"success": False, "error": f"Route {route_id} not found"}
     
     template_site_ids = route['site_ids']
     week_number = route['week_number']
@@ -560,14 +729,7 @@ def build_pool_from_template(
     if due_date_end:
         print(f"Filtering jobs due on or before: {due_date_end}")
     
-    # Step 1: Get current MOI jobs for template sites
-    moi_jobs_result = match_sites_to_current_jobs(template_site_ids, due_date_end=due_date_end)
-    moi_jobs = moi_jobs_result.get('jobs', [])
-    missing_moi_sites = moi_jobs_result.get('missing_sites', [])
-    
-    print(f"Found {len(moi_jobs)} current MOI jobs, {len(missing_moi_sites)} sites missing work orders")
-    
-    # Step 2: Find historically paired sites
+    # Step 1: Find historically paired sites
     historical_result = find_historically_paired_sites(
         template_site_ids,
         week_number,
@@ -578,9 +740,18 @@ def build_pool_from_template(
     
     print(f"Found {len(historically_paired)} historically paired sites")
     
-    # Get current jobs for historically paired sites
+    # Step 2: Get current jobs for the template (MOI) sites and the
+    # historically paired sites in one query
     historical_site_ids = [s['site_id'] for s in historically_paired if s.get('site_id')]
-    historical_jobs_result = match_sites_to_current_jobs(historical_site_ids, due_date_end=due_date_end)
+    moi_jobs_result, historical_jobs_result = match_site_groups_to_current_jobs(
+        [template_site_ids, historical_site_ids],
+        due_date_end=due_date_end
+    )
+    moi_jobs = moi_jobs_result.get('jobs', [])
+    missing_moi_sites = moi_jobs_result.get('missing_sites', [])
+    
+    print(f"Found {len(moi_jobs)} current MOI jobs, {len(missing_moi_sites)} sites missing work orders")
+    
     historical_jobs = historical_jobs_result.get('jobs', [])
     
     # Add pairing frequency to jobs
@@ -634,4 +805,7 @@ def build_pool_from_template(
     }
 
 
-
+def clear_pool_caches():
+    """Drop cached routes and pools; call after writes to job_pool or scheduled_jobs."""
+    get_last_month_routes.cache_clear()
+    build_pool_from_template.cache_clear()
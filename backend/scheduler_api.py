@@ -8,22 +8,29 @@ from email.mime.multipart import MIMEMultipart
 
 logger = logging.getLogger(__name__)
 from datetime import datetime, date, timedelta
-from typing import List, Optional, Dict, Any
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List, Optional, Dict, Any, Tuple
 from fastapi import FastAPI, Header, HTTPException, UploadFile, File, Query
-from fastapi.responses import JSONResponse, FileResponse, HTMLResponse
+from fastapi.responses import JSONResponse, FileResponse, HTMLResponse, ORJSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 from scheduler_fillin import schedule_week_fillin
 import pandas as pd
+import numpy as np
 import io
+import orjson
 import scheduler_v5_geographic as sched_v5
+from scheduler_utils import haversine, haversine_many, nearest_haversine, equirectangular_min
 from route_template_builder import (
     get_last_month_routes,
     find_historically_paired_sites,
     match_sites_to_current_jobs,
     get_nearby_annuals,
-    build_pool_from_template
+    build_pool_from_template,
+    clear_pool_caches
 )
 _db_semaphore = threading.Semaphore(10)
 
@@ -40,8 +47,8 @@ GMAIL_APP_PASSWORD = os.getenv("GMAIL_APP_PASSWORD", "")
 
 # Import your existing modules
 try:
-    from supabase_client import sb_select, sb_insert, sb_update, supabase_client
-    from db_queries import job_pool_df as _jp, technicians_df as _techs
+    from supabase_client import sb_select, sb_insert, sb_insert_new, sb_update, supabase_client
+    from db_queries import job_pool_df as _jp, technicians_df as _techs, select_in, ttl_cache
     
 except ImportError:
     logger.critical("Missing dependencies - install: supabase, pandas")
@@ -49,7 +56,18 @@ except ImportError:
 # ============================================================================
 # APP SETUP
 # ============================================================================
-app = FastAPI(title="Unified Scheduler API", version="2.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the shared Supabase client (and its keep-alive pool) before the
+    # first request instead of inside it
+    try:
+        supabase_client()
+    except Exception as e:
+        logger.warning(f"Supabase client not initialised at startup: {e}")
+    yield
+
+app = FastAPI(title="Unified Scheduler API", version="2.1.0", default_response_class=ORJSONResponse,
+              lifespan=lifespan)
 
 # Serve frontend
 
@@ -423,6 +441,11 @@ app.mount("/static", StaticFiles(directory=frontend_path), name="static")
 
 frontend_dir = os.path.join(os.path.dirname(__file__), "..", "frontend")
 
+# The pages only change on deploy; keep them in memory instead of
+# re-reading the file on every request
+HTML_CACHE_TTL_SECONDS = 300
+
+@ttl_cache(HTML_CACHE_TTL_SECONDS)
 def serve_html_page(filename: str) -> str:
     """Serve an HTML file from the frontend directory."""
     html_path = os.path.join(frontend_dir, filename)
@@ -518,6 +541,10 @@ def health():
 # JOB POOL
 # ----------------------------------------------------------------------------
 
+# Urgency by days until due: < 7 critical, < 14 high, else normal (and unknown)
+URGENCY_DAY_BOUNDS = np.array([7, 14])
+URGENCY_LEVELS = np.array(["critical", "high", "normal"])
+
 @app.get("/api/jobs/unscheduled")
 def get_unscheduled_jobs(
     region: Optional[str] = Query(None),
@@ -529,8 +556,6 @@ def get_unscheduled_jobs(
 ):
     """Get all unscheduled jobs with eligibility info and visit windows"""
     
-    from datetime import datetime, timedelta
-    
     logger.debug(f"get_unscheduled_jobs: start_date={start_date}, end_date={end_date}")
     
     # Build filters list
@@ -544,51 +569,60 @@ def get_unscheduled_jobs(
         next_day = (end_date_obj + timedelta(days=1)).strftime("%Y-%m-%d")
         filters.append(("due_date", "lt", next_day))
     
+    # Region, priority and limit are applied by the query, so only matching rows come back
+    if region:
+        filters.append(("site_state", "eq", region))
+    if priority:
+        filters.append(("jp_priority", "eq", priority))
+    
     # Get jobs with filters
-    jobs = sb_select("job_pool", filters=filters)
+    jobs = sb_select("job_pool", filters=filters, limit=limit)
     logger.debug(f"get_unscheduled_jobs: {len(jobs)} jobs returned from DB")
     
     if not jobs:
         return {"count": 0, "jobs": [], "summary": {}}
     
-    # Apply additional filters
-    if region:
-        jobs = [j for j in jobs if j.get("site_state") == region]
-    if priority:
-        jobs = [j for j in jobs if j.get("jp_priority") == priority]
-    
-    # Apply limit
-    jobs = jobs[:limit]
-    
-    # === BATCH FETCH VISIT WINDOWS (1 query instead of 500+) ===
+    # === BATCH FETCH VISIT WINDOWS + ELIGIBILITY (independent, run concurrently) ===
     site_ids = list(set(j.get('site_id') for j in jobs if j.get('site_id')))
-    window_lookup = {}
-    if site_ids:
+    work_orders = [j["work_order"] for j in jobs]
+    
+    def fetch_visit_windows():
+        if not site_ids:
+            return {}
         try:
-            sb = supabase_client()
-            windows = sb.table('site_visit_windows').select('*').in_('site_id', site_ids).execute()
-            window_lookup = {w['site_id']: w for w in (windows.data or [])}
+            windows = select_in('site_visit_windows', 'site_id', site_ids)
+            return {w['site_id']: w for w in windows}
         except Exception as e:
             logger.warning(f"Could not fetch visit windows: {e}")
+            return {}
     
-    # === BATCH FETCH ELIGIBILITY (1 query instead of 500+) ===
-    work_orders = [j["work_order"] for j in jobs]
-    eligibility_lookup = {}
-    if work_orders:
+    def fetch_eligibility():
+        eligibility_lookup = defaultdict(list)
+        if not work_orders:
+            return eligibility_lookup
         try:
-            all_elig = sb_select("job_technician_eligibility", filters=[
-                ("work_order", "in", work_orders)
-            ])
+            all_elig = select_in("job_technician_eligibility", "work_order", work_orders,
+                                 columns="work_order,technician_id")
             for e in all_elig:
-                wo = e["work_order"]
-                if wo not in eligibility_lookup:
-                    eligibility_lookup[wo] = []
-                eligibility_lookup[wo].append(e["technician_id"])
+                eligibility_lookup[e["work_order"]].append(e["technician_id"])
         except Exception as e:
             logger.warning(f"Could not fetch eligibility: {e}")
+        return eligibility_lookup
+    
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        windows_future = ex.submit(fetch_visit_windows)
+        eligibility_future = ex.submit(fetch_eligibility)
+    window_lookup = windows_future.result()
+    eligibility_lookup = eligibility_future.result()
+    
+    # Days until due and urgency for all jobs at once (one date parse, not one per job)
+    due = pd.to_datetime(pd.Series([j.get("due_date") for j in jobs], dtype=object), format="ISO8601")
+    days_left = (due - pd.Timestamp.now()).dt.days
+    urgency = URGENCY_LEVELS[np.searchsorted(URGENCY_DAY_BOUNDS, days_left.to_numpy(), side="right")]
+    days_left = [None if pd.isna(d) else int(d) for d in days_left]
     
     # Add metadata to each job
-    for job in jobs:
+    for job, days, urgency_level in zip(jobs, days_left, urgency.tolist()):
         # Attach eligibility
         wo = job["work_order"]
         elig_techs = eligibility_lookup.get(wo, [])
@@ -610,37 +644,18 @@ def get_unscheduled_jobs(
         else:
             job['visit_window'] = None
         
-        # Calculate urgency
-        due = pd.to_datetime(job.get("due_date"))
-        days_left = (due - pd.Timestamp.now()).days
-        job["days_until_due"] = days_left
-        
-        if days_left < 7:
-            job["urgency"] = "critical"
-        elif days_left < 14:
-            job["urgency"] = "high"
-        else:
-            job["urgency"] = "normal"
+        job["days_until_due"] = days
+        job["urgency"] = urgency_level
     
     # Summary stats
     summary = {
         "total_jobs": len(jobs),
         "total_hours": sum(float(j.get("duration", 2)) for j in jobs),
-        "by_priority": {},
-        "by_region": {},
-        "by_urgency": {}
+        "by_priority": dict(Counter(j.get("jp_priority", "Unknown") for j in jobs)),
+        "by_region": dict(Counter(j.get("site_state", "Unknown") for j in jobs)),
+        "by_urgency": dict(Counter(j["urgency"] for j in jobs))
     }
     
-    for job in jobs:
-        pri = job.get("jp_priority", "Unknown")
-        summary["by_priority"][pri] = summary["by_priority"].get(pri, 0) + 1
-        
-        reg = job.get("site_state", "Unknown")
-        summary["by_region"][reg] = summary["by_region"].get(reg, 0) + 1
-        
-        urg = job.get("urgency", "normal")
-        summary["by_urgency"][urg] = summary["by_urgency"].get(urg, 0) + 1
-    
     logger.debug(f"get_unscheduled_jobs: returning {len(jobs)} jobs")
     return {
         "count": len(jobs),
@@ -651,16 +666,12 @@ def get_unscheduled_jobs(
 # SCHEDULE OPERATIONS
 # ----------------------------------------------------------------------------
 
-@app.get("/api/regions/analyze")
-def analyze_regions_for_tech(
-    tech_id: int,
-    month_start: str,
-    month_end: str
-):
-    """Get regions with job counts for a tech"""
-    sb = supabase_client()
-    
-    result = sb.rpc(
+# Region analysis is re-requested while users pick regions; reuse it briefly
+REGION_ANALYSIS_CACHE_TTL_SECONDS = 60
+
+@ttl_cache(REGION_ANALYSIS_CACHE_TTL_SECONDS, maxsize=256)
+def _analyze_regions(tech_id: int, month_start: str, month_end: str) -> List[Dict]:
+    result = supabase_client().rpc(
         'analyze_regions_for_tech',
         {
             'p_tech_id': tech_id,
@@ -669,10 +680,57 @@ def analyze_regions_for_tech(
             'p_sow_filter': None
         }
     ).execute()
-    
+    return result.data or []
+
+# The roster and eligibility change on human time-scales (tech edits,
+# eligibility recalcs, imports); the analysis endpoints reuse them for a while
+ROSTER_CACHE_TTL_SECONDS = 300
+
+@ttl_cache(ROSTER_CACHE_TTL_SECONDS)
+def _active_technicians() -> List[Dict]:
+    return sb_select("technicians", filters=[("active", "eq", True)],
+                     columns="technician_id, name, home_latitude, home_longitude, max_weekly_hours")
+
+@ttl_cache(ROSTER_CACHE_TTL_SECONDS)
+def _active_tech_homes() -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """Names and home coordinates of active techs with a home location, as parallel arrays"""
+    homed = [t for t in _active_technicians() if t.get('home_latitude') and t.get('home_longitude')]
+    return (
+        [t['name'] for t in homed],
+        np.array([float(t['home_latitude']) for t in homed]),
+        np.array([float(t['home_longitude']) for t in homed]),
+    )
+
+@ttl_cache(ROSTER_CACHE_TTL_SECONDS, maxsize=32)
+def _eligibility_for_jobs(work_orders: List[int]) -> List[Dict]:
+    return select_in("job_technician_eligibility", "work_order", work_orders,
+                     columns="work_order, technician_id")
+
+def clear_schedule_caches():
+    """Drop cached pools, routes, region analyses, roster and eligibility after a write"""
+    clear_pool_caches()
+    _analyze_regions.cache_clear()
+    _active_technicians.cache_clear()
+    _active_tech_homes.cache_clear()
+    _eligibility_for_jobs.cache_clear()
+
+@app.get("/api/regions/analyze")
+def analyze_regions_for_tech(
+    tech_id: int,
+    month_start: str,
+    month_end: str
+):
+    """Get regions with job counts for a tech"""
     return {
-        "regions": result.data or []
+        "regions": _analyze_regions(tech_id, month_start, month_end)
     }
+
+@app.post("/api/schedule/invalidate-cache")
+def invalidate_schedule_cache():
+    """Drop cached analyses, e.g. after editing jobs directly in the database"""
+    clear_schedule_caches()
+    return {"success": True}
+
 @app.get("/api/jobs/region")
 def get_jobs_in_region(
     tech_id: int,
@@ -866,9 +924,7 @@ def api_get_last_month_routes(reference_date: str = None):
         from route_template_builder import get_last_month_routes
         return get_last_month_routes(reference_date)
     except Exception as e:
-        print(f"Error getting last month routes: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.error(f"Error getting last month routes: {e}", exc_info=True)
         raise HTTPException(500, str(e))
 
 
@@ -912,9 +968,7 @@ def api_get_historical_pairings(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error getting historical pairings: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.error(f"Error getting historical pairings: {e}", exc_info=True)
         raise HTTPException(500, str(e))
 
 
@@ -953,9 +1007,7 @@ def api_build_pool_from_template(request: BuildPoolRequest):
             min_historical_overlap=request.min_historical_overlap
         )
     except Exception as e:
-        print(f"Error building pool from template: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.error(f"Error building pool from template: {e}", exc_info=True)
         raise HTTPException(500, str(e))
 
 
@@ -993,9 +1045,7 @@ def api_get_nearby_annuals(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error getting nearby annuals: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.error(f"Error getting nearby annuals: {e}", exc_info=True)
         raise HTTPException(500, str(e))
 
 
@@ -1003,8 +1053,16 @@ def api_get_nearby_annuals(
 def assign_single_job(req: AssignJobRequest):
     """Assign one job to a tech on a specific date"""
     
-    # 1. Get job details
-    job = sb_select("job_pool", filters=[("work_order", "eq", req.work_order)])
+    # 1. Get job details, embedding this tech's eligibility row and any
+    #    existing schedule row (both FK to job_pool) in the same request
+    job = sb_select(
+        "job_pool",
+        columns="*, job_technician_eligibility(technician_id), scheduled_jobs(work_order)",
+        filters=[
+            ("work_order", "eq", req.work_order),
+            ("job_technician_eligibility.technician_id", "eq", req.technician_id)
+        ]
+    )
     if not job:
         return {"success": False, "errors": ["Job not found"]}
     
@@ -1017,23 +1075,14 @@ def assign_single_job(req: AssignJobRequest):
     tech = tech_result[0]
 
     # 3. Check tech eligibility
-    elig = sb_select("job_technician_eligibility", filters=[
-        ("work_order", "eq", req.work_order),
-        ("technician_id", "eq", req.technician_id)
-    ])
-    
-    if not elig:
+    if not job.get("job_technician_eligibility"):
         return {
             "success": False, 
             "errors": [f"Tech {req.technician_id} is not eligible for job {req.work_order}"]
         }
     
-    # 4. Check if already scheduled
-    existing = sb_select("scheduled_jobs", filters=[
-        ("work_order", "eq", req.work_order)
-    ])
-    
-    if existing:
+    # 4. Check if already scheduled (one-to-one embed: object, or list on older PostgREST)
+    if job.get("scheduled_jobs"):
         return {
             "success": False,
             "errors": [f"Job {req.work_order} is already scheduled"]
@@ -1059,10 +1108,17 @@ def assign_single_job(req: AssignJobRequest):
     }
     
     try:
-        sb_insert("scheduled_jobs", [scheduled_row])
+        # ON CONFLICT DO NOTHING on the work_order key: a concurrent assignment
+        # that got in after the check above writes nothing instead of erroring
+        if not sb_insert_new("scheduled_jobs", [scheduled_row], on_conflict="work_order"):
+            return {
+                "success": False,
+                "errors": [f"Job {req.work_order} is already scheduled"]
+            }
         
         # 6. Update job status
         sb_update("job_pool", {"work_order": req.work_order}, {"jp_status": "Scheduled"})
+        clear_schedule_caches()
         
         return {
             "success": True,
@@ -1079,7 +1135,6 @@ def assign_single_job(req: AssignJobRequest):
 def remove_job_from_schedule(work_order: int):
     """Remove a job from schedule"""
     
-    from supabase_client import supabase_client
     sb = supabase_client()
     
     # Delete from scheduled_jobs
@@ -1087,6 +1142,7 @@ def remove_job_from_schedule(work_order: int):
     
     # Reset job status
     sb_update("job_pool", {"work_order": work_order}, {"jp_status": "Call"})
+    clear_schedule_caches()
     
     return {"success": True, "work_order": work_order}
 
@@ -1132,6 +1188,7 @@ def update_scheduled_job(req: UpdateScheduleRequest):
     
     # Update the record
     sb.table("scheduled_jobs").update(updates).eq("work_order", req.work_order).execute()
+    clear_schedule_caches()
     
     return {"success": True, "work_order": req.work_order, "updates": updates}
 
@@ -1150,6 +1207,7 @@ def unschedule_job(req: UnscheduleRequest):
     
     # Reset job status to Waiting to Schedule
     sb.table("job_pool").update({"jp_status": "Waiting to Schedule"}).eq("work_order", req.work_order).execute()
+    clear_schedule_caches()
     
     return {"success": True, "work_order": req.work_order}
 
@@ -1164,8 +1222,26 @@ def add_secondary_tech(req: AddSecondaryTechRequest):
     """Add a secondary technician to a scheduled job using the additional_techs table"""
     sb = supabase_client()
     
+    # The job lookup (whose embedded rows say whether this tech is already on it)
+    # and the tech lookup are independent; run them concurrently
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        job_future = ex.submit(
+            sb_select,
+            "scheduled_jobs",
+            filters=[
+                ("work_order", "eq", req.work_order),
+                ("scheduled_job_additional_techs.technician_id", "eq", req.secondary_tech_id),
+            ],
+            columns="work_order, technician_id, scheduled_job_additional_techs(technician_id)",
+        )
+        tech_future = ex.submit(
+            sb_select, "technicians", filters=[("technician_id", "eq", req.secondary_tech_id)],
+            columns="technician_id, name"
+        )
+    existing = job_future.result()
+    tech = tech_future.result()
+    
     # Check job exists
-    existing = sb_select("scheduled_jobs", filters=[("work_order", "eq", req.work_order)])
     if not existing:
         return {"success": False, "error": "Job not found in schedule"}
     
@@ -1175,19 +1251,12 @@ def add_secondary_tech(req: AddSecondaryTechRequest):
     if job.get('technician_id') == req.secondary_tech_id:
         return {"success": False, "error": "Cannot add primary tech as secondary tech"}
     
-    # Get secondary tech name
-    tech = sb_select("technicians", filters=[("technician_id", "eq", req.secondary_tech_id)])
+    # Check secondary tech exists
     if not tech:
         return {"success": False, "error": "Secondary technician not found"}
     
     # Check if already added
-    existing_addl = sb.table("scheduled_job_additional_techs")\
-        .select("*")\
-        .eq("work_order", req.work_order)\
-        .eq("technician_id", req.secondary_tech_id)\
-        .execute()
-    
-    if existing_addl.data:
+    if job.get("scheduled_job_additional_techs"):
         return {"success": False, "error": "This technician is already assigned to this job"}
     
     # Insert into the additional techs table
@@ -1227,54 +1296,26 @@ def remove_secondary_tech(work_order: int, technician_id: int):
 @app.get("/api/schedule/additional-techs")
 def get_all_additional_techs(week_start: str = None):
     """Get all additional tech assignments, optionally filtered by week"""
-    sb = supabase_client()
     try:
-        # Get all additional tech assignments
-        addl_techs = sb.table("scheduled_job_additional_techs").select("*").execute()
-
-        if not addl_techs.data:
-            return {"success": True, "additional_techs": []}
-
-        # Batch-load all referenced work orders and tech IDs (2 queries instead of N*2)
-        work_orders = list(set(a['work_order'] for a in addl_techs.data))
-        tech_ids = list(set(a['technician_id'] for a in addl_techs.data))
-
-        all_jobs = sb_select("scheduled_jobs", filters=[("work_order", "in", work_orders)])
-        jobs_by_wo = {j['work_order']: j for j in all_jobs}
-
-        all_techs = sb_select("technicians", filters=[("technician_id", "in", tech_ids)])
-        techs_by_id = {t['technician_id']: t for t in all_techs}
-
-        result = []
-        for addl in addl_techs.data:
-            job = jobs_by_wo.get(addl['work_order'])
-            if not job:
-                continue
-
-            # Filter by week if specified
-            if week_start:
-                start_date = datetime.fromisoformat(week_start).date()
-                end_date = start_date + timedelta(days=4)
-                job_date = datetime.fromisoformat(job['date']).date() if job.get('date') else None
-                if not job_date or not (start_date <= job_date <= end_date):
-                    continue
-
-            tech = techs_by_id.get(addl['technician_id'])
-
-            result.append({
-                "work_order": addl['work_order'],
-                "technician_id": addl['technician_id'],
-                "tech_name": tech['name'] if tech else f"Tech {addl['technician_id']}",
-                "date": job.get('date'),
-                "site_name": job.get('site_name'),
-                "site_city": job.get('site_city'),
-                "duration": job.get('duration'),
-                "primary_tech_id": job.get('technician_id'),
-                "primary_tech_name": job.get('assigned_tech_name'),
-                "sow_1": job.get('sow_1')
-            })
-
-        return {"success": True, "additional_techs": result}
+        # One read: the view joins scheduled_jobs and technicians server-side
+        # (see "View v_additional_techs_expanded.sql")
+        filters = []
+        if week_start:
+            start_date = datetime.fromisoformat(week_start).date()
+            end_date = start_date + timedelta(days=4)
+            filters = [("date", "gte", str(start_date)), ("date", "lte", str(end_date))]
+        
+        result = sb_select("v_additional_techs_expanded", filters=filters)
+        
+        # Same body as {"success": true, "additional_techs": [...]}, written row by
+        # row so a long range isn't serialized into one buffer before sending
+        def stream_rows():
+            yield b'{"success":true,"additional_techs":['
+            for i, row in enumerate(result):
+                yield orjson.dumps(row) if i == 0 else b"," + orjson.dumps(row)
+            yield b"]}"
+        
+        return StreamingResponse(stream_rows(), media_type="application/json")
 
     except Exception as e:
         logger.error(f"Error getting additional techs: {e}")
@@ -1297,9 +1338,6 @@ def get_full_week_schedule(week_start: str):
     Get all scheduled jobs for a week WITH hotel, initial drive, and between-job drive calculations
     """
     try:
-        from scheduler_v5_geographic import haversine
-        sb = supabase_client()
-        
         start_date = datetime.fromisoformat(week_start).date()
         end_date = start_date + timedelta(days=4)
         
@@ -1318,7 +1356,7 @@ def get_full_week_schedule(week_start: str):
             }
         
         # Get all technicians for home location data
-        technicians = sb_select("technicians")
+        technicians = sb_select("technicians", columns="technician_id, name, home_latitude, home_longitude")
         tech_homes = {}
         for t in technicians:
             if t.get('home_latitude') and t.get('home_longitude'):
@@ -1335,11 +1373,12 @@ def get_full_week_schedule(week_start: str):
         # Calculate hotel stays, initial drive, and between-job drive
         enhanced_jobs = []
         last_locations = {}  # Track where tech ended previous day
+        week_tech_ids = set(job['technician_id'] for job in scheduled_jobs)
         
         for day_num in range(5):  # Mon-Fri
             current_date = str(start_date + timedelta(days=day_num))
             
-            for tech_id in set(job['technician_id'] for job in scheduled_jobs):
+            for tech_id in week_tech_ids:
                 key = f"{tech_id}-{current_date}"
                 daily_jobs = jobs_by_tech_date.get(key, [])
                 
@@ -1439,28 +1478,25 @@ def get_full_week_schedule(week_start: str):
         
         # Fetch additional techs for this week and merge into results
         try:
-            addl_techs = sb.table("scheduled_job_additional_techs").select("*").execute()
-            if addl_techs.data:
+            # Only rows for this week's work orders (chunked IN queries, not the whole table)
+            addl_techs = select_in("scheduled_job_additional_techs", "work_order",
+                                   [job['work_order'] for job in scheduled_jobs],
+                                   columns="work_order, technician_id")
+            if addl_techs:
                 # Create lookup of additional techs by work_order
-                addl_by_wo = {}
-                for addl in addl_techs.data:
-                    wo = addl['work_order']
-                    if wo not in addl_by_wo:
-                        addl_by_wo[wo] = []
-                    addl_by_wo[wo].append(addl['technician_id'])
+                addl_by_wo = defaultdict(list)
+                for addl in addl_techs:
+                    addl_by_wo[addl['work_order']].append(addl['technician_id'])
+                tech_names = {t['technician_id']: t['name'] for t in technicians}
                 
                 # Add additional_techs array to each job
                 for job in enhanced_jobs:
                     wo = job.get('work_order')
                     if wo in addl_by_wo:
                         job['additional_tech_ids'] = addl_by_wo[wo]
-                        # Get names
-                        names = []
-                        for tid in addl_by_wo[wo]:
-                            t = next((x for x in technicians if x['technician_id'] == tid), None)
-                            if t:
-                                names.append(t['name'])
-                        job['additional_tech_names'] = names
+                        job['additional_tech_names'] = [
+                            tech_names[tid] for tid in addl_by_wo[wo] if tid in tech_names
+                        ]
         except Exception as e:
             logger.warning(f"Could not fetch additional techs: {e}")
         
@@ -1471,9 +1507,7 @@ def get_full_week_schedule(week_start: str):
         }
         
     except Exception as e:
-        import traceback
-        logger.error(f"Error in get_full_week_schedule: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.error(f"Error in get_full_week_schedule: {str(e)}", exc_info=True)
         raise HTTPException(500, f"Failed to load week: {str(e)}")
 
 
@@ -1481,9 +1515,6 @@ def get_full_week_schedule(week_start: str):
 def monthly_analysis(year: int, month: int):
     """Monthly planning analysis with regional breakdown and drive time estimates"""
     
-    from datetime import date, timedelta
-    from collections import defaultdict
-    
     try:
         # Calculate month boundaries
         month_start = date(year, month, 1)
@@ -1492,12 +1523,12 @@ def monthly_analysis(year: int, month: int):
         else:
             month_end = date(year, month + 1, 1)
         
-        # Get all jobs for the month
+        # Get all jobs for the month (only the fields the analysis reads)
         jobs = sb_select("job_pool", filters=[
             ("due_date", "gte", str(month_start)),
             ("due_date", "lt", str(month_end)),
             ("jp_status", "in", ["Call", "Waiting to Schedule"])
-        ])
+        ], columns="work_order, site_name, region, duration, due_date, jp_priority, latitude, longitude")
         
         if not jobs:
             return {
@@ -1515,9 +1546,14 @@ def monthly_analysis(year: int, month: int):
                 "problem_jobs": {"remote_locations": [], "limited_eligibility": []}
             }
         
-        # Get techs and regions
-        techs = sb_select("technicians", filters=[("active", "eq", True)])
-        regions = sb_select("regions")
+        # Techs, regions and eligibility don't depend on each other; fetch concurrently
+        with ThreadPoolExecutor(max_workers=3) as ex:
+            techs_future = ex.submit(_active_technicians)
+            regions_future = ex.submit(sb_select, "regions",
+                                       columns="region_name, center_latitude, center_longitude")
+            elig_future = ex.submit(_eligibility_for_jobs, [j["work_order"] for j in jobs])
+        techs = techs_future.result()
+        regions = regions_future.result()
         
         # Create region lookup
         region_lookup = {}
@@ -1527,8 +1563,9 @@ def monthly_analysis(year: int, month: int):
                 'center_lng': region.get('center_longitude')
             }
         
-        # Import haversine from scheduler_utils
-        from scheduler_utils import haversine
+        # Tech homes as arrays (cached with the roster): one vectorized distance
+        # call per region / job
+        home_names, home_lats, home_lngs = _active_tech_homes()
         
         # Calculate total work hours
         total_work_hours = sum(float(j.get("duration", 2)) for j in jobs)
@@ -1569,13 +1606,11 @@ def monthly_analysis(year: int, month: int):
                 min_home_distance = 999999
                 if region_name in region_lookup and region_lookup[region_name]['center_lat']:
                     region_center = region_lookup[region_name]
-                    for tech in techs:
-                        if tech.get('home_latitude') and region_center['center_lat']:
-                            dist = haversine(
-                                tech['home_latitude'], tech['home_longitude'],
-                                region_center['center_lat'], region_center['center_lng']
-                            )
-                            min_home_distance = min(min_home_distance, dist)
+                    if len(home_names):
+                        min_home_distance = float(haversine_many(
+                            region_center['center_lat'], region_center['center_lng'],
+                            home_lats, home_lngs
+                        ).min())
                 else:
                     min_home_distance = 50  # Default assumption if no coordinates
                 
@@ -1612,26 +1647,34 @@ def monthly_analysis(year: int, month: int):
             'other': 0
         })
         
+        # Many jobs share a due date and a priority; classify each distinct value once
+        week_key_by_due = {}
+        category_by_priority = {}
         for job in jobs:
-            due = date.fromisoformat(str(job['due_date']))
-            week_num = ((due - month_start).days // 7) + 1
-            if week_num > 4:
-                week_num = 4
+            due = job['due_date']
+            week_key = week_key_by_due.get(due)
+            if week_key is None:
+                week_num = ((date.fromisoformat(str(due)) - month_start).days // 7) + 1
+                week_key = week_key_by_due[due] = f"week_{min(week_num, 4)}"
             
-            week_key = f"week_{week_num}"
-            weekly_stats[week_key]['jobs'] += 1
-            weekly_stats[week_key]['work_hours'] += float(job.get('duration', 2))
+            week_data = weekly_stats[week_key]
+            week_data['jobs'] += 1
+            week_data['work_hours'] += float(job.get('duration', 2))
             
             # Categorize by priority
             priority = job.get('jp_priority', '')
-            if priority in ['NOV', 'Urgent']:
-                weekly_stats[week_key]['urgent'] += 1
-            elif 'Monthly' in priority:
-                weekly_stats[week_key]['monthly'] += 1
-            elif 'Annual' in priority or 'Year' in priority:
-                weekly_stats[week_key]['annual'] += 1
-            else:
-                weekly_stats[week_key]['other'] += 1
+            category = category_by_priority.get(priority)
+            if category is None:
+                if priority in ['NOV', 'Urgent']:
+                    category = 'urgent'
+                elif 'Monthly' in priority:
+                    category = 'monthly'
+                elif 'Annual' in priority or 'Year' in priority:
+                    category = 'annual'
+                else:
+                    category = 'other'
+                category_by_priority[priority] = category
+            week_data[category] += 1
         
         # Estimate drive time per week (proportional to job distribution)
         weekly_breakdown = []
@@ -1664,12 +1707,39 @@ def monthly_analysis(year: int, month: int):
         problem_jobs = {"remote_locations": [], "limited_eligibility": []}
         
         REMOTE_THRESHOLD = 300  # miles
+        # The flat-earth prefilter is within ~6% of haversine at these ranges, so a
+        # job whose approximate nearest tech is under this share of the threshold
+        # can't be remote and skips the exact calculation
+        REMOTE_PREFILTER_FACTOR = 0.8
+        
+        # Eligibility for every job, fetched up front (chunked IN queries, not one per job)
+        elig_by_wo = defaultdict(list)
+        for e in elig_future.result():
+            elig_by_wo[e["work_order"]].append(e)
+        
+        # Nearest homed tech for every located job that might be remote: one job x tech
+        # distance matrix, after a cheap equirectangular pass drops the clearly-near ones
+        located = [i for i, job in enumerate(jobs) if job.get('latitude') and job.get('longitude')]
+        nearest_by_job = {}
+        if located and len(home_names):
+            job_lats = np.array([jobs[i]['latitude'] for i in located], dtype=float)
+            job_lngs = np.array([jobs[i]['longitude'] for i in located], dtype=float)
+            maybe_remote = np.flatnonzero(
+                equirectangular_min(job_lats, job_lngs, home_lats, home_lngs)
+                >= REMOTE_PREFILTER_FACTOR * REMOTE_THRESHOLD
+            )
+            if len(maybe_remote):
+                nearest_idx, nearest_dist = nearest_haversine(
+                    job_lats[maybe_remote], job_lngs[maybe_remote], home_lats, home_lngs
+                )
+                for row, k in enumerate(maybe_remote):
+                    nearest_by_job[located[k]] = (
+                        float(nearest_dist[row]), home_names[int(nearest_idx[row])]
+                    )
         
-        for job in jobs:
+        for job_idx, job in enumerate(jobs):
             # Check eligibility
-            elig = sb_select("job_technician_eligibility", filters=[
-                ("work_order", "eq", job["work_order"])
-            ])
+            elig = elig_by_wo.get(job["work_order"], [])
             
             if len(elig) <= 2:
                 problem_jobs["limited_eligibility"].append({
@@ -1683,18 +1753,10 @@ def monthly_analysis(year: int, month: int):
             
             # Check if remote (>150 miles from any tech)
             if job.get('latitude') and job.get('longitude'):
-                min_distance = 999999
-                closest_tech = None
-                
-                for tech in techs:
-                    if tech.get('home_latitude') and tech.get('home_longitude'):
-                        dist = haversine(
-                            tech['home_latitude'], tech['home_longitude'],
-                            job['latitude'], job['longitude']
-                        )
-                        if dist < min_distance:
-                            min_distance = dist
-                            closest_tech = tech['name']
+                if len(home_names):
+                    min_distance, closest_tech = nearest_by_job.get(job_idx, (0, None))
+                else:
+                    min_distance, closest_tech = 999999, None
                 
                 if min_distance > REMOTE_THRESHOLD:
                     problem_jobs["remote_locations"].append({
@@ -1731,8 +1793,7 @@ def monthly_analysis(year: int, month: int):
         }
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.error(f"Error in monthly_analysis: {e}", exc_info=True)
         return {
             "error": str(e),
             "summary": {
@@ -1905,7 +1966,6 @@ async def upload_jobs(file: UploadFile = File(...)):
         df = df.where(pd.notnull(df), None)
         
         # Upload to staging table
-        from supabase_client import supabase_client
         sb = supabase_client()
         
         # Clear existing staging data
@@ -1977,15 +2037,14 @@ async def process_staging():
     - Updates existing non-scheduled jobs (sow_1, due_date, etc.)
     - Skips jobs already marked as 'Scheduled'
     """
-    import json
     import re
 
     try:
-        from supabase_client import supabase_client
         sb = supabase_client()
 
         # Call the import function
         result = sb.rpc('import_new_jobs').execute()
+        clear_schedule_caches()
 
         # Result.data should contain our JSONB response
         if result.data:
@@ -1994,17 +2053,18 @@ async def process_staging():
                 details = result.data['details']
                 # details may be a byte string like b'{...}'
                 if isinstance(details, (bytes, bytearray)):
-                    return json.loads(details.decode('utf-8'))
+                    return orjson.loads(details)
                 elif isinstance(details, str):
                     # Strip b'...' wrapper if present
                     cleaned = re.sub(r"^b'(.*)'$", r'\1', details)
-                    return json.loads(cleaned)
+                    return orjson.loads(cleaned)
             return result.data
         else:
             return {"success": True, "message": "Processing complete"}
 
     except Exception as e:
         error_str = str(e)
+        clear_schedule_caches()  # the import may have gone through anyway
 
         # The Supabase client sometimes throws an error but the function actually succeeded
         # Extract the actual result from the error message
@@ -2015,16 +2075,16 @@ async def process_staging():
             if match:
                 try:
                     json_str = match.group(1).replace('\\"', '"')
-                    return json.loads(json_str)
-                except (json.JSONDecodeError, ValueError):
+                    return orjson.loads(json_str)
+                except orjson.JSONDecodeError:
                     pass
 
             # Pattern 2: raw JSON in error string
             match = re.search(r'(\{[^{}]*"success"\s*:\s*true[^{}]*\})', error_str)
             if match:
                 try:
-                    return json.loads(match.group(1))
-                except (json.JSONDecodeError, ValueError):
+                    return orjson.loads(match.group(1))
+                except orjson.JSONDecodeError:
                     pass
 
             # Pattern 3: details field contains the response
@@ -2032,8 +2092,8 @@ async def process_staging():
             if match:
                 try:
                     cleaned = match.group(1).strip("b'\"")
-                    return json.loads(cleaned)
-                except (json.JSONDecodeError, ValueError):
+                    return orjson.loads(cleaned)
+                except orjson.JSONDecodeError:
                     pass
 
         logger.error(f"Process staging error: {error_str}")
@@ -2049,7 +2109,6 @@ async def add_single_job(job: SingleJob):
     Add a single job directly to production
     """
     try:
-        from supabase_client import supabase_client
         sb = supabase_client()
         
         # Prepare job data
@@ -2071,6 +2130,7 @@ async def add_single_job(job: SingleJob):
         
         # Insert directly to job_pool
         result = sb.table('job_pool').insert(job_data).execute()
+        clear_schedule_caches()
         
         # Trigger should handle eligibility calculation
         # If not, we can call it manually:
@@ -2092,54 +2152,64 @@ async def remove_jobs(request: RemoveJobRequest):
     Remove/cancel jobs from the system (archives them first)
     """
     try:
-        from supabase_client import supabase_client
         sb = supabase_client()
         
         archived_count = 0
         
-        # Archive each job before deleting
-        for work_order in request.work_orders:
+        # Fetch every job in one batched lookup, then archive them in one insert
+        try:
+            jobs = select_in('job_pool', 'work_order', request.work_orders)
+        except Exception as fetch_error:
+            logger.error(f"Error fetching jobs to archive: {fetch_error}")
+            jobs = []
+        
+        archived_date = datetime.now().isoformat()
+        archive_reason = request.reason if hasattr(request, 'reason') else 'Removed via data manager'
+        archive_rows = [
+            {
+                # Map job_pool columns to job_archive columns
+                'work_order': job_data['work_order'],
+                'site_name': job_data.get('site_name'),
+                'site_id': job_data.get('site_id'),
+                'address': job_data.get('site_address'),  # job_pool: site_address -> job_archive: address
+                'site_city': job_data.get('site_city'),
+                'site_state': job_data.get('site_state'),
+                'site_zip': None,  # Not in job_pool
+                'site_latitude': job_data.get('latitude'),  # job_pool: latitude -> job_archive: site_latitude
+                'site_longitude': job_data.get('longitude'),  # job_pool: longitude -> job_archive: site_longitude
+                'due_date': job_data.get('due_date'),
+                'sow_1': job_data.get('sow_1'),
+                'sow_2': None,  # Not in job_pool
+                'jp_status': job_data.get('jp_status'),
+                'eligible_technicians': None,  # Not in job_pool
+                'archived_date': archived_date,
+                'archive_reason': archive_reason,
+                'archived_by': 'system'
+            }
+            for job_data in jobs
+        ]
+        
+        if archive_rows:
             try:
-                # Get job data from job_pool
-                job_result = sb.table('job_pool').select('*').eq('work_order', work_order).execute()
-                
-                if job_result.data:
-                    job_data = job_result.data[0]
-                    
-                    # Map job_pool columns to job_archive columns
-                    archive_data = {
-                        'work_order': job_data['work_order'],
-                        'site_name': job_data.get('site_name'),
-                        'site_id': job_data.get('site_id'),
-                        'address': job_data.get('site_address'),  # job_pool: site_address -> job_archive: address
-                        'site_city': job_data.get('site_city'),
-                        'site_state': job_data.get('site_state'),
-                        'site_zip': None,  # Not in job_pool
-                        'site_latitude': job_data.get('latitude'),  # job_pool: latitude -> job_archive: site_latitude
-                        'site_longitude': job_data.get('longitude'),  # job_pool: longitude -> job_archive: site_longitude
-                        'due_date': job_data.get('due_date'),
-                        'sow_1': job_data.get('sow_1'),
-                        'sow_2': None,  # Not in job_pool
-                        'jp_status': job_data.get('jp_status'),
-                        'eligible_technicians': None,  # Not in job_pool
-                        'archived_date': datetime.now().isoformat(),
-                        'archive_reason': request.reason if hasattr(request, 'reason') else 'Removed via data manager',
-                        'archived_by': 'system'
-                    }
-                    
-                    # Insert into job_archive
-                    sb.table('job_archive').insert(archive_data).execute()
-                    archived_count += 1
-                    
-            except Exception as archive_error:
-                logger.error(f"Error archiving job {work_order}: {archive_error}")
-                # Continue to delete even if archive fails
+                sb.table('job_archive').insert(archive_rows).execute()
+                archived_count = len(archive_rows)
+            except Exception as batch_error:
+                # One bad row fails the whole batch; retry row by row so the rest are archived
+                logger.warning(f"Batch archive failed, retrying per job: {batch_error}")
+                for row in archive_rows:
+                    try:
+                        sb.table('job_archive').insert(row).execute()
+                        archived_count += 1
+                    except Exception as archive_error:
+                        logger.error(f"Error archiving job {row['work_order']}: {archive_error}")
+                        # Continue to delete even if archive fails
         
         # Remove from scheduled_jobs if they exist there
         sb.table('scheduled_jobs').delete().in_('work_order', request.work_orders).execute()
         
         # Remove from job_pool
         result = sb.table('job_pool').delete().in_('work_order', request.work_orders).execute()
+        clear_schedule_caches()
         
         return {
             "success": True,
@@ -2162,11 +2232,11 @@ async def recalculate_eligibility():
     Recalculate tech eligibility for all jobs
     """
     try:
-        from supabase_client import supabase_client
         sb = supabase_client()
         
         # Call the recalculation function
         result = sb.rpc('populate_tech_eligibility').execute()
+        clear_schedule_caches()
         
         # Get counts
         eligibility_count = sb.table('job_technician_eligibility').select('*', count='exact').execute()
@@ -2197,7 +2267,6 @@ ALLOWED_JOB_FIELDS = {
 async def update_job_field(request: dict):
     """Update a single field in a job"""
     try:
-        from supabase_client import supabase_client
         sb = supabase_client()
 
         work_order = request.get('work_order')
@@ -2211,6 +2280,7 @@ async def update_job_field(request: dict):
 
         # Update the job
         result = sb.table('job_pool').update({field: value}).eq('work_order', work_order).execute()
+        clear_schedule_caches()
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Job not found")
@@ -2230,7 +2300,6 @@ async def get_database_status():
     Get current database statistics
     """
     try:
-        from supabase_client import supabase_client
         sb = supabase_client()
         
         # Get various counts
@@ -2283,7 +2352,6 @@ async def preview_staging():
     Preview what's in the staging table
     """
     try:
-        from supabase_client import supabase_client
         sb = supabase_client()
         
         # Get first 10 rows from staging
@@ -2418,6 +2486,7 @@ def toggle_technician_active(req: ToggleActiveRequest):
             {"technician_id": req.technician_id},
             {"active": req.active}
         )
+        clear_schedule_caches()
         
         return {
             "success": True,
@@ -2484,6 +2553,7 @@ def recalculate_eligibility_for_tech(tech_id: int):
     # Insert new eligibility records
     if eligible_jobs:
         sb_insert("job_technician_eligibility", eligible_jobs)
+    clear_schedule_caches()
     
     logger.info(f"Recalculated eligibility for Tech {tech_id}: {len(eligible_jobs)} eligible jobs")
 
@@ -2531,6 +2601,17 @@ def get_technician_time_off(
         "time_off": expanded
     }
 
+def _delete_single_day_time_off(sb, tech_id: int, dates: List[str]):
+    """Delete a tech's one-day time off entries on the given dates (2 round-trips, not one per date)."""
+    rows = sb.table("time_off_requests").select("id,start_date,end_date")\
+        .eq("technician_id", tech_id)\
+        .in_("start_date", dates)\
+        .execute().data or []
+    # PostgREST can't compare two columns, so pick start == end here
+    ids = [r["id"] for r in rows if r["start_date"] == r["end_date"]]
+    if ids:
+        sb.table("time_off_requests").delete().in_("id", ids).execute()
+
 @app.post("/api/timeoff/save")
 def save_time_off(req: SaveTimeOffRequest):
     """
@@ -2544,26 +2625,25 @@ def save_time_off(req: SaveTimeOffRequest):
     tech_id = req.time_off[0].technician_id
     
     try:
-        # Delete existing entries for these dates
+        # One entry per date; a repeated date keeps its last value
+        by_date = {entry.date: entry for entry in req.time_off}
+        
+        # Delete existing single-day entries for these dates
         sb = supabase_client()
+        _delete_single_day_time_off(sb, tech_id, list(by_date))
         
-        for entry in req.time_off:
-            # Delete existing entry for this date
-            sb.table("time_off_requests").delete()\
-                .eq("technician_id", tech_id)\
-                .eq("start_date", entry.date)\
-                .eq("end_date", entry.date)\
-                .execute()
-            
-            # Insert new entry
-            sb_insert("time_off_requests", [{
+        # Insert new entries in one batch
+        sb_insert("time_off_requests", [
+            {
                 "technician_id": tech_id,
                 "start_date": entry.date,
                 "end_date": entry.date,
                 "hours_per_day": float(entry.hours_per_day),
                 "reason": entry.reason or "Time off",
                 "approved": True  # Auto-approve for now
-            }])
+            }
+            for entry in by_date.values()
+        ])
         
         return {
             "success": True,
@@ -2584,12 +2664,7 @@ def delete_time_off(req: DeleteTimeOffRequest):
         
         if req.dates:
             # Delete specific dates
-            for date_str in req.dates:
-                sb.table("time_off_requests").delete()\
-                    .eq("technician_id", req.technician_id)\
-                    .eq("start_date", date_str)\
-                    .eq("end_date", date_str)\
-                    .execute()
+            _delete_single_day_time_off(sb, req.technician_id, req.dates)
             return {
                 "success": True,
                 "message": f"Deleted {len(req.dates)} time off entries"
@@ -2781,9 +2856,7 @@ def get_all_techs_availability_batch(week_start: str):
         return {"availability": availability}
         
     except Exception as e:
-        logger.error(f"Error in availability-batch: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.error(f"Error in availability-batch: {e}", exc_info=True)
         raise HTTPException(500, str(e))
 
 
@@ -2797,7 +2870,6 @@ async def get_single_job(work_order: int):
     Get a single job by work order number
     """
     try:
-        from supabase_client import supabase_client
         sb = supabase_client()
         
         result = sb.table('job_pool').select('*').eq('work_order', work_order).execute()
@@ -2825,7 +2897,6 @@ async def get_all_jobs(
     - limit: Max results (default 1000)
     """
     try:
-        from supabase_client import supabase_client
         sb = supabase_client()
         
         query = sb.table('job_pool').select('*')
@@ -2860,7 +2931,6 @@ async def archive_job(request: ArchiveJobRequest):
     Archive a job (move to job_archive table)
     """
     try:
-        from supabase_client import supabase_client
         sb = supabase_client()
         
         # First get the job data
@@ -2901,6 +2971,7 @@ async def archive_job(request: ArchiveJobRequest):
         
         # Remove from job_pool
         sb.table('job_pool').delete().eq('work_order', request.work_order).execute()
+        clear_schedule_caches()
         
         return {
             "success": True,
@@ -3075,8 +3146,11 @@ def send_email(to_addr: str, subject: str, html_body: str, cc_addrs: list = None
         server.sendmail(GMAIL_ADDRESS, all_recipients, msg.as_string())
 
 
+# Concurrent SMTP sessions per schedule send (Gmail throttles many parallel logins)
+EMAIL_SEND_WORKERS = 4
+
 @app.post("/api/send-schedule-emails")
-async def send_schedule_emails(request: SendScheduleEmailRequest):
+def send_schedule_emails(request: SendScheduleEmailRequest):
     """Send weekly schedule emails to all techs with jobs, plus master email."""
     try:
         if not GMAIL_APP_PASSWORD:
@@ -3127,44 +3201,56 @@ async def send_schedule_emails(request: SendScheduleEmailRequest):
         failed = []
         all_tech_schedules = []
         week_label = start_date.strftime('%B %d, %Y')
-        
-        for tech_id, tech_jobs in jobs_by_tech.items():
-            # Skip if not in selected list (when selection is provided)
-            if request.selected_tech_ids and tech_id not in request.selected_tech_ids:
-                continue
+        cc = [e for e in request.cc_emails if e] if request.cc_emails else []
+        
+        # Each tech's email is independent, so sends run concurrently; outcomes
+        # are kept in tech order (a failure dict, or a pending send)
+        outcomes = []
+        with ThreadPoolExecutor(max_workers=EMAIL_SEND_WORKERS) as ex:
+            for tech_id, tech_jobs in jobs_by_tech.items():
+                # Skip if not in selected list (when selection is provided)
+                if request.selected_tech_ids and tech_id not in request.selected_tech_ids:
+                    continue
 
-            tech = tech_lookup.get(tech_id)
-            if not tech:
-                failed.append({"tech_id": tech_id, "error": "Technician not found"})
-                continue
+                tech = tech_lookup.get(tech_id)
+                if not tech:
+                    outcomes.append({"tech_id": tech_id, "error": "Technician not found"})
+                    continue
 
-            tech_name = tech.get('name', f'Tech {tech_id}')
-            tech_email = tech.get('email')
-            tech_time_off = timeoff_by_tech.get(tech_id, [])
-            note = notes_lookup.get(tech_id, '')
-            
-            # Build the HTML for this tech
-            tech_html = build_tech_schedule_html(
-                tech_name, request.week_start, tech_jobs, tech_time_off, note
-            )
-            
-            all_tech_schedules.append({
-                'tech_name': tech_name,
-                'tech_email': tech_email,
-                'html': tech_html
-            })
-            
-            # Send individual email if tech has an email address
-            if tech_email:
-                try:
+                tech_name = tech.get('name', f'Tech {tech_id}')
+                tech_email = tech.get('email')
+                tech_time_off = timeoff_by_tech.get(tech_id, [])
+                note = notes_lookup.get(tech_id, '')
+                
+                # Build the HTML for this tech
+                tech_html = build_tech_schedule_html(
+                    tech_name, request.week_start, tech_jobs, tech_time_off, note
+                )
+                
+                all_tech_schedules.append({
+                    'tech_name': tech_name,
+                    'tech_email': tech_email,
+                    'html': tech_html
+                })
+                
+                # Send individual email if tech has an email address
+                if tech_email:
                     subject = f"CGRS Schedule - {tech_name} - Week of {week_label}"
-                    cc = [e for e in request.cc_emails if e] if request.cc_emails else []
-                    send_email(tech_email, subject, tech_html, cc_addrs=cc)
-                    sent_count += 1
-                except Exception as e:
-                    failed.append({"tech_name": tech_name, "email": tech_email, "error": str(e)})
-            else:
-                failed.append({"tech_name": tech_name, "error": "No email address on file"})
+                    send = ex.submit(send_email, tech_email, subject, tech_html, cc_addrs=cc)
+                    outcomes.append((tech_name, tech_email, send))
+                else:
+                    outcomes.append({"tech_name": tech_name, "error": "No email address on file"})
+        
+        for outcome in outcomes:
+            if isinstance(outcome, dict):
+                failed.append(outcome)
+                continue
+            tech_name, tech_email, send = outcome
+            try:
+                send.result()
+                sent_count += 1
+            except Exception as e:
+                failed.append({"tech_name": tech_name, "email": tech_email, "error": str(e)})
         
         # Send master schedule email
         master_sent = False
@@ -3193,9 +3279,7 @@ async def send_schedule_emails(request: SendScheduleEmailRequest):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Send schedule emails error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.error(f"Send schedule emails error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -3472,9 +3556,7 @@ async def export_gps_routes(
         )
         
     except Exception as e:
-        logger.error(f"GPS export error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.error(f"GPS export error: {e}", exc_info=True)
         raise HTTPException(500, str(e))
 # ============================================================================
 # RUN
@@ -631,8 +631,7 @@ def fill_day_greedy_geographic(
             work_hours += best_job.duration
             drive_hours += drive_time
             current_location = (best_job.latitude, best_job.longitude)
-            already_scheduled.add(best_job.work_order)
-            region_jobs.remove(best_job)
+            already_scheduled.add(best_job.work_order)  # skipped by the scan above; no list.remove needed
             print(f"      Added: {best_job.site_name} - {best_job.duration}h, {best_distance:.1f} mi")
         else:
             # No job fits in current region, find nearest job in ANY region
@@ -6,6 +6,7 @@ from datetime import datetime, timedelta
 from math import radians, cos, sin, asin, sqrt
 from typing import List, Tuple, Optional
 from dataclasses import dataclass
+import numpy as np
 
 # ============================================================================
 # DATA MODELS
@@ -57,7 +58,9 @@ def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """
     R = 3958.8  # Earth radius in miles
     
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+    # Unpacked radians() calls rather than map() over a list: this runs per
+    # job pair in the schedulers' loops, and the temporaries add up
+    lat1, lon1, lat2, lon2 = radians(lat1), radians(lon1), radians(lat2), radians(lon2)
     dlat = lat2 - lat1
     dlon = lon2 - lon1
     
@@ -66,6 +69,66 @@ def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     
     return R * c
 
+def haversine_many(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """
+    Distances in miles from one point to arrays of points (same formula as haversine)
+    """
+    lats_rad = np.radians(lats)
+    return haversine_many_rad(lat, lon, lats_rad, np.radians(lons), np.cos(lats_rad))
+
+def haversine_many_rad(lat: float, lon: float, lats_rad: np.ndarray, lons_rad: np.ndarray,
+                       cos_lats: np.ndarray) -> np.ndarray:
+    """
+    haversine_many with the targets already in radians (and their cosines),
+    for loops that measure from many points to the same set
+    """
+    R = 3958.8  # Earth radius in miles
+    
+    lat1, lon1 = radians(lat), radians(lon)
+    dlat = lats_rad - lat1
+    dlon = lons_rad - lon1
+    
+    a = np.sin(dlat/2)**2 + cos(lat1) * cos_lats * np.sin(dlon/2)**2
+    return R * 2 * np.arcsin(np.sqrt(a))
+
+def equirectangular_min(lats1: np.ndarray, lons1: np.ndarray,
+                        lats2: np.ndarray, lons2: np.ndarray) -> np.ndarray:
+    """
+    Approximate distance in miles from each point in set 1 to its nearest
+    point in set 2, treating the earth as flat around each set 1 point
+    (equirectangular projection). No per-pair trig, so it's a cheap
+    prefilter; within a few hundred miles it is close to haversine.
+    """
+    R = 3958.8  # Earth radius in miles
+    
+    lat1 = np.radians(np.asarray(lats1, dtype=float))[:, None]
+    lon1 = np.radians(np.asarray(lons1, dtype=float))[:, None]
+    lat2 = np.radians(np.asarray(lats2, dtype=float))[None, :]
+    lon2 = np.radians(np.asarray(lons2, dtype=float))[None, :]
+    
+    dx = (lon2 - lon1) * np.cos(lat1)
+    dy = lat2 - lat1
+    return R * np.sqrt((dx*dx + dy*dy).min(axis=1))
+
+def nearest_haversine(lats1: np.ndarray, lons1: np.ndarray,
+                      lats2: np.ndarray, lons2: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    For each point in set 1, the index of the nearest point in set 2 and its
+    distance in miles (same formula as haversine), from one set 1 x set 2
+    broadcast. The minimum is taken on the haversine term, which increases
+    with distance, so sqrt/asin run once per row instead of once per pair.
+    """
+    R = 3958.8  # Earth radius in miles
+    
+    lat1 = np.radians(np.asarray(lats1, dtype=float))[:, None]
+    lon1 = np.radians(np.asarray(lons1, dtype=float))[:, None]
+    lat2 = np.radians(np.asarray(lats2, dtype=float))[None, :]
+    lon2 = np.radians(np.asarray(lons2, dtype=float))[None, :]
+    
+    a = np.sin((lat2 - lat1)/2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1)/2)**2
+    idx = a.argmin(axis=1)
+    return idx, R * 2 * np.arcsin(np.sqrt(a[np.arange(len(idx)), idx]))
+
 def calculate_drive_time(distance_miles: float, avg_speed: float = 45) -> float:
     """
     Calculate drive time in hours
@@ -73,6 +136,49 @@ def calculate_drive_time(distance_miles: float, avg_speed: float = 45) -> float:
     """
     return distance_miles / avg_speed
 
+def two_opt_order(start: Tuple[float, float], stops: List[Tuple[float, float]]) -> List[int]:
+    """
+    Improve a visiting order with 2-opt: the route starts at `start`, visits
+    `stops` and ends at the last stop (open path, no return leg).
+    
+    Returns the new order as indexes into `stops`; unchanged if no
+    reversal shortens the route.
+    """
+    R = 3958.8  # Earth radius in miles
+    
+    points = [start] + list(stops)
+    n = len(points)
+    
+    # Same values as haversine(), but with radians/cos done once per point and
+    # each pair once (the matrix is symmetric) instead of per ordered pair
+    rad = [(radians(p[0]), radians(p[1])) for p in points]
+    cos_lat = [cos(lat) for lat, _ in rad]
+    dist = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        lat1, lon1 = rad[i]
+        for j in range(i + 1, n):
+            lat2, lon2 = rad[j]
+            a = sin((lat2 - lat1)/2)**2 + cos_lat[i] * cos_lat[j] * sin((lon2 - lon1)/2)**2
+            dist[i][j] = dist[j][i] = R * (2 * asin(sqrt(a)))
+    path = list(range(n))
+    
+    improved = True
+    while improved:
+        improved = False
+        for i in range(n - 2):
+            for j in range(i + 2, n):
+                # Reverse path[i+1..j]; the last stop has no outgoing leg
+                before = dist[path[i]][path[i + 1]]
+                after = dist[path[i]][path[j]]
+                if j < n - 1:
+                    before += dist[path[j]][path[j + 1]]
+                    after += dist[path[i + 1]][path[j + 1]]
+                if after < before - 1e-9:
+                    path[i + 1:j + 1] = reversed(path[i + 1:j + 1])
+                    improved = True
+    
+    return [p - 1 for p in path[1:]]
+
 # ============================================================================
 # TIME CALCULATIONS
 # ============================================================================
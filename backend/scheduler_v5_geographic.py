@@ -6,7 +6,10 @@ import os
 from datetime import date, datetime, timedelta
 from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass
-from scheduler_utils import haversine, calculate_drive_time, calculate_start_times
+import numpy as np
+from scheduler_utils import (
+    haversine, haversine_many_rad, two_opt_order, calculate_drive_time, calculate_start_times
+)
 from supabase_client import supabase_client
 from scheduler_fillin import get_site_freshness, filter_jobs_by_freshness
 
@@ -151,21 +154,26 @@ def build_daily_route(
         - Last location (lat, lon)
     """
     scheduled_today = []
-    remaining_jobs = jobs.copy()
     current_location = start_location
     
+    # Coordinates as arrays (radians and cosines computed once) so each step
+    # measures every candidate at once; scheduled jobs are masked out instead
+    # of removed from a list
+    lats_rad = np.radians(np.fromiter((j.latitude for j in jobs), dtype=np.float64, count=len(jobs)))
+    lons_rad = np.radians(np.fromiter((j.longitude for j in jobs), dtype=np.float64, count=len(jobs)))
+    cos_lats = np.cos(lats_rad)
+    visited = np.zeros(len(jobs), dtype=bool)
+    remaining = len(jobs)
+    
     work_hours = 0
     drive_hours = 0
     
-    while remaining_jobs and work_hours < max_work_hours:
-        # Find nearest unscheduled job
-        nearest_job = min(
-            remaining_jobs,
-            key=lambda j: haversine(
-                current_location[0], current_location[1],
-                j.latitude, j.longitude
-            )
-        )
+    while remaining and work_hours < max_work_hours:
+        # Find nearest unscheduled job (first one wins ties, as with min())
+        distances = haversine_many_rad(current_location[0], current_location[1], lats_rad, lons_rad, cos_lats)
+        distances[visited] = np.inf
+        nearest_idx = int(np.argmin(distances))
+        nearest_job = jobs[nearest_idx]
         
         # Calculate drive time to this job
         distance = haversine(
@@ -181,11 +189,27 @@ def build_daily_route(
             work_hours += nearest_job.duration
             drive_hours += drive_time
             current_location = (nearest_job.latitude, nearest_job.longitude)
-            remaining_jobs.remove(nearest_job)
+            visited[nearest_idx] = True
+            remaining -= 1
         else:
             # Can't fit any more jobs today
             break
     
+    # Nearest-neighbor picks the day's jobs; 2-opt then untangles their
+    # order, which can only shorten the drive
+    if len(scheduled_today) > 2:
+        order = two_opt_order(start_location, [(j.latitude, j.longitude) for j in scheduled_today])
+        if order != list(range(len(scheduled_today))):
+            scheduled_today = [scheduled_today[i] for i in order]
+            drive_hours = 0
+            previous = start_location
+            for job in scheduled_today:
+                drive_hours += calculate_drive_time(haversine(
+                    previous[0], previous[1], job.latitude, job.longitude
+                ))
+                previous = (job.latitude, job.longitude)
+            current_location = previous
+    
     return scheduled_today, work_hours, drive_hours, current_location
 
 # ============================================================================
@@ -370,10 +394,11 @@ def schedule_week_geographic(
                 initial_drive_time = calculate_drive_time(distance_to_first)
                 drive_hours += initial_drive_time
                 print(f"    Adding {initial_drive_time:.1f}h drive from home to first job")
-        # Remove scheduled jobs from remaining
-        for job in daily_jobs:
-            if job in remaining_jobs:
-                remaining_jobs.remove(job)
+        # Remove scheduled jobs from remaining (one pass, work-order lookups
+        # instead of a field-by-field list search per job)
+        if daily_jobs:
+            scheduled_wos = {job.work_order for job in daily_jobs}
+            remaining_jobs = [job for job in remaining_jobs if job.work_order not in scheduled_wos]
         
         # Calculate distance back to home
         distance_to_home = haversine(
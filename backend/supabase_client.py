@@ -1,24 +1,37 @@
 # supabase_client.py
 import os
+import threading
 import time
 from typing import Any, Dict, List, Optional, Tuple
 
+import httpx
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
 
 load_dotenv()
 
 _SUPABASE_URL = os.getenv("SUPABASE_URL")
 _SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY")
 
+# Every query goes through one pooled HTTP/2 client. Idle connections are
+# kept for a minute so requests a few seconds apart skip the TLS handshake
+# (httpx's default is 5 s); the pool is sized for the concurrent IN-chunk and
+# history fetches.
+_HTTP_TIMEOUT = 120  # postgrest's default request timeout
+_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=50, keepalive_expiry=60)
+
 _client: Optional[Client] = None
+_client_lock = threading.Lock()
 
 def supabase_client() -> Client:
     global _client
     if _client is None:
-        if not _SUPABASE_URL or not _SUPABASE_KEY:
-            raise RuntimeError("Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY")
-        _client = create_client(_SUPABASE_URL, _SUPABASE_KEY)
+        with _client_lock:  # queries run from worker threads too
+            if _client is None:
+                if not _SUPABASE_URL or not _SUPABASE_KEY:
+                    raise RuntimeError("Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY")
+                http = httpx.Client(http2=True, timeout=_HTTP_TIMEOUT, limits=_HTTP_LIMITS, follow_redirects=True)
+                _client = create_client(_SUPABASE_URL, _SUPABASE_KEY, options=ClientOptions(httpx_client=http))
     return _client
 
 def _retry(fn, *, retries: int = 3, backoff: float = 0.8):
@@ -61,6 +74,16 @@ def sb_select(table: str, *, filters: Optional[List[Tuple[str, str, Any]]] = Non
 def sb_insert(table: str, rows: List[Dict[str, Any]]):
     return _retry(lambda: supabase_client().table(table).insert(rows).execute().data)
 
+def sb_insert_new(table: str, rows: List[Dict[str, Any]], on_conflict: str):
+    """Insert rows, skipping any that conflict on `on_conflict`; returns only the rows written.
+
+    Not retried: if an attempt commits but its response is lost, a retry would
+    see its own rows as conflicts and return [], which reads as "already there".
+    """
+    return (supabase_client().table(table)
+            .upsert(rows, on_conflict=on_conflict, ignore_duplicates=True)
+            .execute().data)
+
 def sb_update(table: str, match: Dict[str, Any], patch: Dict[str, Any]):
     def _do():
         q = supabase_client().table(table).update(patch)
@@ -1,4 +1,5 @@
 
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 from math import radians, sin, cos, sqrt, atan2
@@ -12,6 +13,7 @@ from db_queries import job_pool_df as _jp, eligibility_df as _elig, technicians_
 job_pool_df = pd.DataFrame()
 job_technician_eligibility_df = pd.DataFrame()
 technicians_df = pd.DataFrame()
+technicians_by_id = {}  # technician_id -> row dict, built once with technicians_df
 site_distance_matrix_df = pd.DataFrame()
 
 # Ensure datetime types
@@ -31,6 +33,28 @@ def haversine(lat1, lon1, lat2, lon2):
     c = 2*atan2(sqrt(a), sqrt(1-a))
     return R * c
 
+def haversine_to_many(lat1, lon1, lats, lons):
+    """Vectorized haversine: miles from one point to each of the lats/lons arrays."""
+    R = 3958.8
+    lat1, lon1 = radians(float(lat1)), radians(float(lon1))
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat/2)**2 + cos(lat1)*np.cos(lat2)*np.sin(dlon/2)**2
+    c = 2*np.arctan2(np.sqrt(a), np.sqrt(1-a))
+    return R * c
+
+def _load_job_pool():
+    """Fetch job_pool with its low-cardinality text columns stored as categoricals."""
+    df = _jp()
+    for col in ('jp_status', 'region', 'jp_priority', 'sow_1'):
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    # assign_technician() writes 'Scheduled' back into this column
+    if 'jp_status' in df.columns and 'Scheduled' not in df['jp_status'].cat.categories:
+        df['jp_status'] = df['jp_status'].cat.add_categories(['Scheduled'])
+    return df
+
 def get_travel_time(from_lat, from_lon, to_lat, to_lon, from_site=None, to_site=None):
     """Return drive time in hours; 50 mph fallback if matrix pair not found."""
     try:
@@ -67,16 +91,18 @@ def schedule_technician_week(
         seed_cluster: int | None = None,
 ):
     """Return a one-week schedule list[{date, jobs, total_hours}] for a tech."""
-    global job_pool_df, job_technician_eligibility_df, technicians_df
+    global job_pool_df, job_technician_eligibility_df, technicians_df, technicians_by_id
     
     # Load data if empty
     if job_pool_df.empty:
-        job_pool_df = _jp()
+        job_pool_df = _load_job_pool()
     if job_technician_eligibility_df.empty:
         job_technician_eligibility_df = _elig()
     if technicians_df.empty:
         technicians_df = _techs()
-    tech = technicians_df.loc[technicians_df['technician_id'] == tech_id].iloc[0]
+    if not technicians_by_id:
+        technicians_by_id = technicians_df.set_index('technician_id', drop=False).to_dict('index')
+    tech = technicians_by_id[tech_id]
     assigned_clusters    = assigned_clusters or []
     priority_work_orders = priority_work_orders or []
     target_sow_list      = target_sow_list or []
@@ -90,32 +116,35 @@ def schedule_technician_week(
         job_technician_eligibility_df['technician_id'] == tech_id
     ]['work_order'].tolist()
 
-    # Build WEEKLY working set
-    in_scope_all = job_pool_df[
-        (job_pool_df['work_order'].isin(eligible_work_orders)) &
-        (job_pool_df['jp_status'] != 'Scheduled') &
-        (job_pool_df['due_date'] <= month_end)
-    ].copy()
-
-    # Priority flag
-    in_scope_all['is_priority'] = in_scope_all['work_order'].isin(priority_work_orders)
+    # Build WEEKLY working set: base, horizon and cluster conditions are
+    # combined into one mask so the pool is indexed (and copied) only once.
+    jp = job_pool_df
+    is_priority = jp['work_order'].isin(priority_work_orders)
+    in_scope_mask = (
+        (jp['work_order'].isin(eligible_work_orders)) &
+        (jp['jp_status'] != 'Scheduled') &
+        (jp['due_date'] <= month_end)
+    )
 
     # Horizon filter with overrides
     if horizon_days is not None:
-        in_scope_all = in_scope_all[
-            (in_scope_all['days_til_due'] <= horizon_days) |
-            (in_scope_all['jp_priority'] == 'Monthly O&M') |
-            (in_scope_all['night_test']) |
-            (in_scope_all['is_priority'])
-        ]
+        in_scope_mask &= (
+            (jp['days_til_due'] <= horizon_days) |
+            (jp['jp_priority'] == 'Monthly O&M') |
+            (jp['night_test']) |
+            (is_priority)
+        )
 
     # Optional restriction to assigned clusters with allowed overrides
     if assigned_clusters:
-        mask_cluster  = in_scope_all['cluster_id'].isin(assigned_clusters)
-        mask_sow      = in_scope_all['sow_1'].isin(target_sow_list) if target_sow_list else pd.Series(False, index=in_scope_all.index)
-        mask_night    = in_scope_all['night_test']
-        mask_priority = in_scope_all['is_priority']
-        in_scope_all  = in_scope_all[mask_cluster | mask_sow | mask_night | mask_priority]
+        mask_cluster  = jp['cluster_id'].isin(assigned_clusters)
+        mask_sow      = jp['sow_1'].isin(target_sow_list) if target_sow_list else pd.Series(False, index=jp.index)
+        in_scope_mask &= mask_cluster | mask_sow | jp['night_test'] | is_priority
+
+    in_scope_all = jp[in_scope_mask].copy()
+
+    # Priority flag
+    in_scope_all['is_priority'] = is_priority[in_scope_mask]
 
     # Sort for stability
     if 'zone_3' in in_scope_all.columns:
@@ -125,9 +154,21 @@ def schedule_technician_week(
 
     # Radius cap from tech home
     if radius_miles_cap is not None:
-        def _miles_from_home(r):
-            return haversine(tech['home_latitude'], tech['home_longitude'], r['latitude'], r['longitude'])
-        in_scope_all = in_scope_all[in_scope_all.apply(_miles_from_home, axis=1) <= radius_miles_cap]
+        # Cheap lat/lon bounding box first; exact haversine only on the survivors.
+        # Longitude span uses the poleward edge of the box so the box always
+        # contains the full radius circle.
+        home_lat, home_lon = float(tech['home_latitude']), float(tech['home_longitude'])
+        dlat_deg = radius_miles_cap / 69.0
+        edge_lat = min(abs(home_lat) + dlat_deg, 89.0)
+        dlon_deg = radius_miles_cap / (69.0 * cos(radians(edge_lat)))
+        in_scope_all = in_scope_all[
+            in_scope_all['latitude'].between(home_lat - dlat_deg, home_lat + dlat_deg) &
+            in_scope_all['longitude'].between(home_lon - dlon_deg, home_lon + dlon_deg)
+        ]
+        miles = haversine_to_many(home_lat, home_lon,
+                                  in_scope_all['latitude'].to_numpy(dtype=float),
+                                  in_scope_all['longitude'].to_numpy(dtype=float))
+        in_scope_all = in_scope_all[miles <= radius_miles_cap]
 
     # Seed region/cluster preference
     if seed_region is not None and 'region' in in_scope_all.columns:
@@ -194,13 +235,15 @@ def schedule_technician_week(
         in_scope_all = in_scope_all[in_scope_all['work_order'] != work_order]
 
     # Helper filters
+    # Boolean indexing already returns a new frame, and add_travel_and_capacity()
+    # copies before adding columns, so no defensive .copy() here.
     def filter_for_date(pool_df: pd.DataFrame, d: datetime) -> pd.DataFrame:
         if pool_df.empty:
-            return pool_df.copy()
+            return pool_df
         return pool_df[
             ((pool_df['is_recurring_site']) & (pool_df['due_date'] == d)) |
             ((~pool_df['is_recurring_site']) & (pool_df['due_date'] >= d))
-        ].copy()
+        ]
 
     def add_travel_and_capacity(df: pd.DataFrame, current_loc: dict, daily_hours: float,
                                 max_hours: float, weekday: int) -> pd.DataFrame:
@@ -291,7 +334,7 @@ def schedule_technician_week(
             remove_from_pools(int(r['work_order']))
 
         # Anchor SOW phase
-        anchor_today = filter_for_date(anchor_pool, current_date) if not anchor_pool.empty else anchor_pool.copy()
+        anchor_today = filter_for_date(anchor_pool, current_date)
         while daily_hours < max_hours and not anchor_today.empty:
             if night_present_today and pre_night_day_job_cap > 0 and pre_night_count >= pre_night_day_job_cap:
                 break
@@ -483,6 +526,22 @@ def schedule_technician_week(
 schedules = {}
 scheduled_jobs_export = []
 
+def _commit_scheduled_jobs(rows):
+    """Write the exported rows to scheduled_jobs and flip their job_pool status."""
+    try:
+        from db_writes import upsert_scheduled_jobs, mark_jobs_scheduled
+        seen, batch = set(), []
+        for r in rows:
+            wo = int(r["work_order"])
+            if wo in seen:
+                continue
+            seen.add(wo)
+            batch.append(r)
+        upsert_scheduled_jobs(batch)          # writes to scheduled_jobs
+        mark_jobs_scheduled(list(seen))       # flips job_pool.jp_status='Scheduled'
+    except Exception as e:
+        raise RuntimeError(f"supabase_write_failed: {type(e).__name__}: {e}")
+
 def assign_technician(tech_id, start_date,
                       assigned_clusters=None, priority_work_orders=None,
                       horizon_days=21,
@@ -501,8 +560,6 @@ def assign_technician(tech_id, start_date,
     global scheduled_jobs_export
     scheduled_jobs_export = []
 
-    tech_name = technicians_df.loc[technicians_df['technician_id'] == tech_id, 'name'].iloc[0]
-
     schedule = schedule_technician_week(
         tech_id=tech_id,
         start_date=start_date,
@@ -522,6 +579,7 @@ def assign_technician(tech_id, start_date,
         seed_cluster=seed_cluster
     )
 
+    tech_name = technicians_by_id[tech_id]['name']
     schedules[tech_id] = schedule
     for day in schedule:
         for job in day['jobs']:
@@ -540,19 +598,8 @@ def assign_technician(tech_id, start_date,
                 'due_date':           job_pool_df.loc[job_pool_df['work_order'] == job['work_order'], 'due_date'].values[0]
             })
 
-        try:
-            from db_writes import upsert_scheduled_jobs, mark_jobs_scheduled
-            seen, batch = set(), []
-            for r in scheduled_jobs_export:
-                wo = int(r["work_order"])
-                if wo in seen:
-                    continue
-                seen.add(wo)
-                batch.append(r)
-            upsert_scheduled_jobs(batch)          # writes to scheduled_jobs
-            mark_jobs_scheduled(list(seen))       # flips job_pool.jp_status='Scheduled'
-        except Exception as e:
-            raise RuntimeError(f"supabase_write_failed: {type(e).__name__}: {e}")
+    if commit:
+        _commit_scheduled_jobs(scheduled_jobs_export)
     return schedule
 
 def export_schedule():